@@ -1,9 +1,14 @@
+import argparse
 import random
-import time
 
 import requests
-from app import db, create_app
-from app.models import Company, FinancialIndicator
+from app import create_app
+from app.models import Company
+from helpers.bulk_upsert import format_counts
+from helpers.http_client import TokenBucket, create_session, get_json
+from helpers.refresh_planner import plan_refresh, record_fetch, commit_checkpoint, checkpoints
+from helpers.response_cache import get_response_cache
+from helpers.shared_matrix import export_shared_matrix
 from dotenv import load_dotenv
 import os
 
@@ -12,18 +17,31 @@ load_dotenv()
 # API key for Alpha Vantage
 API_KEY = os.getenv('ALPHA_VANTAGE_API_KEY')
 
+# Base URL of the API (point it at a local stub server for testing)
+BASE_URL = os.getenv('ALPHA_VANTAGE_BASE_URL', 'https://www.alphavantage.co/query')
+
+# Free plan quota; cached responses do not count against it
+REQUESTS_PER_MINUTE = float(os.getenv('ALPHA_VANTAGE_REQUESTS_PER_MINUTE', 5))
+
+session = create_session(1)
+rate_limiter = TokenBucket(REQUESTS_PER_MINUTE / 60, capacity=1)
+
+
+# Raised when the daily request quota of Alpha Vantage is used up
+class ApiLimitReached(Exception):
+    pass
+
 
 # Function to get data from Alpha Vantage API
 def get_alpha_vantage_data(symbol):
     try:
-        url = f'https://www.alphavantage.co/query?function=OVERVIEW&symbol={symbol}&apikey={API_KEY}'
-        response = requests.get(url)
-        response.raise_for_status()  # Raise HTTPError for bad HTTP responses
-        data = response.json()
+        # Quota messages are not cached, so the symbol is fetched again on the next run
+        data = get_json(session, BASE_URL, params={'function': 'OVERVIEW', 'symbol': symbol, 'apikey': API_KEY},
+                        limiter=rate_limiter, cache=get_response_cache(), endpoint='OVERVIEW',
+                        cacheable=lambda payload: "Information" not in payload)
 
         if "Information" in data:  # Handle API limit issues
-            print(f"API limit reached for symbol {symbol}. Skipping...")
-            return None
+            raise ApiLimitReached(data["Information"])
 
         return data
     except requests.exceptions.RequestException as e:
@@ -42,33 +60,13 @@ def safe_float(value):
         return None
 
 
-# Function to update financial indicators in the database
-def update_financial_indicators(company_id, roe, price_to_earnings_ratio, dividend_yield, volatility, earnings_per_share, EV_to_EBITDA):
-    company = Company.query.get(company_id)
-
-    if company:
-        financial_indicator = FinancialIndicator.query.filter_by(company_id=company_id).first()
-        if not financial_indicator:
-            financial_indicator = FinancialIndicator(company_id=company_id)
-            db.session.add(financial_indicator)
-
-        # Update only if data is available
-        if roe is not None:
-            financial_indicator.roe = roe
-        if price_to_earnings_ratio is not None:
-            financial_indicator.price_to_earnings_ratio = price_to_earnings_ratio
-        if dividend_yield is not None:
-            financial_indicator.dividend_yield = dividend_yield
-        if volatility is not None:
-            financial_indicator.stock_volatility = volatility
-        if earnings_per_share is not None:
-            financial_indicator.earnings_per_share = earnings_per_share
-        if EV_to_EBITDA is not None:
-            financial_indicator.EV_to_EBITDA = EV_to_EBITDA
+# Financial indicator columns filled by the company overview
+OVERVIEW_FIELDS = ['roe', 'price_to_earnings_ratio', 'dividend_yield', 'stock_volatility', 'earnings_per_share',
+                   'EV_to_EBITDA']
 
 
 # Connect to the database and get the list of companies
-def update_all_companies():
+def update_all_companies(full=False):
     companies = Company.query.all()  # Get all companies
 
     # Update data not available in FMP
@@ -79,50 +77,78 @@ def update_all_companies():
         '601668.SS'
     ]
 
-    for company in companies:
-        symbol = company.symbol
+    # Only fetch companies whose data is stale, or missing (None values are retried on later runs)
+    candidates = [company for company in companies if company.symbol in symbols]
+    plan, fetch_log = plan_refresh(candidates, 'alpha_vantage_overview', OVERVIEW_FIELDS, full)
+    print(f"Refreshing {len(plan)} of {len(candidates)} companies.")
+
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    limit_reached = False
+    for checkpoint in checkpoints(plan):
+        values_by_company = {}
+        for company in checkpoint:
+            symbol = company.symbol
 
-        if symbol in symbols:
             # Get data from Alpha Vantage
-            data = get_alpha_vantage_data(symbol)
+            try:
+                data = get_alpha_vantage_data(symbol)
+            except ApiLimitReached as e:
+                # Stop here; the companies that are left are planned again on the next run
+                print(f"API limit reached at symbol {symbol}: {e}")
+                limit_reached = True
+                break
+
             if not data:
                 print(f"Data not available for symbol: {symbol}")
                 continue
-        else:
-            continue
-
-        # TODO: Add None values back in db and try calling alpha venture again for company overall data
-        # Extract relevant fields using safe_float helper
-        roe = safe_float(data.get('ReturnOnEquityTTM'))
-        price_to_earnings_ratio = safe_float(data.get('PERatio'))
-        dividend_yield = safe_float(data.get('DividendYield'))
-        volatility = safe_float(data.get('Beta'))
-        earnings_per_share = safe_float(data.get('EPS'))
-        EV_to_EBITDA = safe_float(data.get('EVToEBITDA'))
-
-        #roe = round(random.uniform(5, 25), 2)  # Return on Equity (5% to 25%)
-        #price_to_earnings_ratio = round(random.uniform(5, 40), 2)  # P/E ratio (5 to 40)
-        #dividend_yield = round(random.uniform(1, 10), 2)  # Dividend yield (1% to 10%)
-        #volatility = round(random.uniform(0.1, 2.5), 2)  # Stock volatility (0.1 to 2.5)
-        #earnings_per_share = round(random.uniform(1, 10), 2)  # Earnings Per Share (1 to 10)
-        #EV_to_EBITDA = round(random.uniform(5, 20), 2)  # EV to EBITDA (5 to 20)
-
-        # Update financial indicators
-        update_financial_indicators(company.id, roe, price_to_earnings_ratio, dividend_yield, volatility, earnings_per_share, EV_to_EBITDA)
-
-        print(f"Updated data for {company.name} ({symbol}).")
-        print(roe, price_to_earnings_ratio, dividend_yield, volatility, earnings_per_share, EV_to_EBITDA)
-
-        time.sleep(12)
+            if not record_fetch(fetch_log, company.id, 'alpha_vantage_overview', data):
+                print(f"Data unchanged for symbol: {symbol}")
+                continue
 
-    db.session.commit()
-    print("Alpha Vantage data successfully updated.")
+            # Extract relevant fields using safe_float helper
+            roe = safe_float(data.get('ReturnOnEquityTTM'))
+            price_to_earnings_ratio = safe_float(data.get('PERatio'))
+            dividend_yield = safe_float(data.get('DividendYield'))
+            volatility = safe_float(data.get('Beta'))
+            earnings_per_share = safe_float(data.get('EPS'))
+            EV_to_EBITDA = safe_float(data.get('EVToEBITDA'))
+
+            #roe = round(random.uniform(5, 25), 2)  # Return on Equity (5% to 25%)
+            #price_to_earnings_ratio = round(random.uniform(5, 40), 2)  # P/E ratio (5 to 40)
+            #dividend_yield = round(random.uniform(1, 10), 2)  # Dividend yield (1% to 10%)
+            #volatility = round(random.uniform(0.1, 2.5), 2)  # Stock volatility (0.1 to 2.5)
+            #earnings_per_share = round(random.uniform(1, 10), 2)  # Earnings Per Share (1 to 10)
+            #EV_to_EBITDA = round(random.uniform(5, 20), 2)  # EV to EBITDA (5 to 20)
+
+            # Update financial indicators (only where data is available) when the checkpoint is committed
+            values_by_company[company.id] = {
+                'roe': roe,
+                'price_to_earnings_ratio': price_to_earnings_ratio,
+                'dividend_yield': dividend_yield,
+                'stock_volatility': volatility,
+                'earnings_per_share': earnings_per_share,
+                'EV_to_EBITDA': EV_to_EBITDA,
+            }
+
+            print(f"Updated data for {company.name} ({symbol}).")
+            print(roe, price_to_earnings_ratio, dividend_yield, volatility, earnings_per_share, EV_to_EBITDA)
+
+        commit_checkpoint(values_by_company, counts)
+        if limit_reached:
+            break
+
+    export_shared_matrix()
+    print(f"Alpha Vantage data successfully updated ({format_counts(counts)}).")
 
 
 # Run the update function directly
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Update financial indicators from Alpha Vantage.')
+    parser.add_argument('--full', action='store_true', help='fetch every company, not only stale or missing data')
+    args = parser.parse_args()
+
     # Create the Flask app and ensure the context is active
     app = create_app()
 
     with app.app_context():
-        update_all_companies()
+        update_all_companies(full=args.full)
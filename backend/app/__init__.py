@@ -26,6 +26,11 @@ def create_app():
     # Initialize database and routes
     with app.app_context():
         from . import routes, models
+        from helpers.database import sqlite_pragmas, register_sqlite_pragmas, apply_migrations
+
+        # WAL, synchronous=NORMAL, mmap and cache size on every connection, so readers don't block on ingestion
+        register_sqlite_pragmas(db.engine, sqlite_pragmas(app.config))
         db.create_all()  # Create the database if it doesn't exist
+        apply_migrations()  # Add indexes missing from databases created by older versions
 
     return app
@@ -6,8 +6,8 @@ class Company(db.Model):
     __tablename__ = 'companies'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    name = db.Column(db.String, nullable=False)
-    symbol = db.Column(db.String(10), nullable=False)
+    name = db.Column(db.String, nullable=False, index=True)
+    symbol = db.Column(db.String(10), nullable=False, index=True)
     rank = db.Column(db.Integer)
     rank_change = db.Column(db.String)
     years_in_rank = db.Column(db.Integer)
@@ -21,7 +21,7 @@ class FinancialIndicator(db.Model):
     __tablename__ = 'financial_indicators'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False, unique=True, index=True)
     revenue = db.Column(db.Integer)
     profit = db.Column(db.Integer)
     profit_change = db.Column(db.String)
@@ -36,3 +36,44 @@ class FinancialIndicator(db.Model):
     EV_to_EBITDA = db.Column(db.Float)
     profit_change_percentage = db.Column(db.Float)  # Profit change as percentage
     revenue_change_percentage = db.Column(db.Float)  # Revenue change as percentage
+
+
+# Single-row table holding the version of the indicator data, bumped by the ingestion scripts
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime)
+
+
+# Last successful fetch of each company from each data source, used to plan incremental refreshes
+class FetchLog(db.Model):
+    __tablename__ = 'fetch_log'
+    __table_args__ = (db.UniqueConstraint('company_id', 'source'),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
+    source = db.Column(db.String, nullable=False)  # e.g. 'fmp_key_metrics'
+    fetched_at = db.Column(db.DateTime, nullable=False)
+    payload_hash = db.Column(db.String(64))  # SHA-256 of the raw response entry
+
+
+# Append-only history of the criteria values of each company, one row per change (see helpers/indicator_history.py)
+class IndicatorHistory(db.Model):
+    __tablename__ = 'indicator_history'
+    __table_args__ = (db.Index('ix_indicator_history_company_as_of', 'company_id', 'as_of', unique=True),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
+    as_of = db.Column(db.DateTime, nullable=False)  # UTC time the values were recorded
+    revenue = db.Column(db.Float)
+    profit = db.Column(db.Float)
+    profit_change_percentage = db.Column(db.Float)
+    revenue_change_percentage = db.Column(db.Float)
+    roe = db.Column(db.Float)
+    price_to_earnings_ratio = db.Column(db.Float)
+    stock_volatility = db.Column(db.Float)
+    dividend_yield = db.Column(db.Float)
+    earnings_per_share = db.Column(db.Float)
+    EV_to_EBITDA = db.Column(db.Float)
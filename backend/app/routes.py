@@ -1,14 +1,29 @@
 from flask import jsonify, request
 from flask import current_app as app
 import numpy as np
-from pyDecision.algorithm import ahp_method, topsis_method, promethee_ii, waspas_method
 
+from app import db
 from app.models import Company, FinancialIndicator
-from helpers.mcda_helpers import list_criteria, fetch_company_data, calculate_pairwise_matrix, \
-    calculate_all_pairwise_matrices, aggregate_ahp_scores, list_methods, generate_comparison_text, min_max_normalisation
+from helpers.ahp import IMPLICIT_AHP_MIN_COMPANIES, ahp_weights, derive_ahp_weights, derive_implicit_ahp_weights
+from helpers.batch_analysis import evaluate_scenarios
+from helpers.indicator_history import fetch_decision_matrix_as_of, company_history
+from helpers.indicator_snapshot import get_indicator_snapshot
+from helpers.ranking import parse_page, top_k_indices, page_info
+from helpers.mcda_methods import topsis_scores, waspas_scores, promethee_ii_flows
+from helpers.metrics import PROMETHEUS_MIMETYPE, Stage, get_metrics_registry, record_rows, timed_route
+from helpers.response_format import JSON_MIMETYPE, negotiate_format, binary_response
+from helpers.result_cache import cached_analysis, get_result_cache
+from helpers.screening import SCREEN_METHODS, DEFAULT_TOP_K, parse_filters, screen_mask, screen_scores
+from helpers.sensitivity import sensitivity_analysis
+from helpers.streaming import ndjson_response
+from helpers.mcda_helpers import list_criteria, find_missing_criteria, calculate_pairwise_tensor, \
+    aggregate_ahp_scores, rank_ahp_scores, list_methods, generate_comparison_text, \
+    iter_comparison_text, min_max_normalisation
 
 
 @app.route('/api/analyze/ahp', methods=['POST'])
+@timed_route('ahp')
+@cached_analysis('ahp')
 def analyze_ahp():
     data = request.json
     selected_companies = data['companies']  # List of selected company IDs
@@ -18,67 +33,155 @@ def analyze_ahp():
     # 'mean'; 'geometric' or 'max_eigen'
     weight_derivation = data.get('weight_derivation', 'geometric')  # Weight derivation method (default: 'geometric')
 
+    include_comparisons = data.get('include_comparisons', True)  # Textual comparisons, n*(n-1)/2 per criterion
+    stream = data.get('stream', False)  # Stream NDJSON: scores first, then the comparisons per criterion
+    try:
+        top_k, offset = parse_page(data)  # Only the k best companies after offset
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    paged = top_k is not None or offset > 0
+
     # Check if pairwise matrix is provided
     if not pairwise_matrix or len(pairwise_matrix) != len(criteria):
         return jsonify({'error': 'Invalid pairwise matrix provided.'}), 400
 
     # Perform AHP for criteria pairwise comparison matrix
     try:
-        criteria_weights, rc = ahp_method(pairwise_matrix, wd=weight_derivation)
+        criteria_weights, rc = ahp_weights(pairwise_matrix, weight_derivation)
 
         if rc > 0.1:  # Consistency check
             return jsonify({'error': 'Inconsistent criteria comparison. Please review your pairwise comparisons for criteria.'}), 400
     except Exception as e:
         return jsonify({'error': f'Error calculating criteria weights: {str(e)}'}), 500
 
-    # Fetch company data
-    company_data = fetch_company_data(selected_companies)
+    # Slice the decision matrix from the in-process indicator snapshot (or the history for as_of)
+    try:
+        with Stage('fetch'):
+            companies, decision_matrix = fetch_decision_matrix_as_of(selected_companies, criteria, data.get('as_of'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    record_rows(len(companies))
 
     # Check if we have enough data
-    if len(company_data) < 2:
+    if len(companies) < 2:
         return jsonify({'error': 'At least two companies are required for analysis'}), 400
 
     # Validate data completeness
-    for company in company_data:
-        for criterion in criteria:
-            if criterion['id'] not in company:
-                return jsonify({'error': f'Missing data for {criterion} in one or more companies'}), 400
-
-    # Compute pairwise comparison matrices for each criterion
-    pairwise_comparison_matrices = calculate_all_pairwise_matrices(company_data, criteria)
+    missing_criteria = find_missing_criteria(decision_matrix, criteria)
+    if missing_criteria:
+        return jsonify({'error': f'Missing data for {", ".join(missing_criteria)} in one or more companies'}), 400
+
+    criterion_types = [c["type"] for c in criteria]
+    if (include_comparisons and not paged) or len(companies) < IMPLICIT_AHP_MIN_COMPANIES:
+        # Compute pairwise comparison matrices for all criteria as one (criteria x n x n) tensor
+        pairwise_tensor = calculate_pairwise_tensor(decision_matrix, criterion_types)
+
+        # Perform AHP for all criteria in one batched step
+        with Stage('compute'):
+            weights, consistency_ratios = derive_ahp_weights(pairwise_tensor, weight_derivation)
+    else:
+        # Without comparisons of all companies, larger sets get their weights from the implicit pairwise
+        # matrices in O(n log n) per criterion; the matrices of the returned page are built below
+        pairwise_tensor = None
+        with Stage('compute'):
+            weights, consistency_ratios = derive_implicit_ahp_weights(decision_matrix, criterion_types,
+                                                                      weight_derivation)
+
+    # MessagePack/Arrow: the weights and scores as arrays, pairwise matrices instead of the comparison texts
+    response_format = JSON_MIMETYPE if stream else negotiate_format()
+    if response_format != JSON_MIMETYPE:
+        scores = np.asarray(criteria_weights) @ weights
+        ranking = top_k_indices(scores, top_k, offset)
+        arrays = {
+            'company_ids': np.array([c["id"] for c in companies]),
+            'criteria_weights': np.asarray(criteria_weights),
+            'alternative_weights': weights,
+            'consistency_ratios': consistency_ratios,
+            'scores': scores,
+            'ranking': ranking
+        }
+        if include_comparisons:
+            compared = np.sort(ranking)
+            arrays['pairwise_companies'] = compared
+            if pairwise_tensor is not None:
+                arrays['pairwise_matrices'] = pairwise_tensor[:, compared][:, :, compared]
+            else:
+                arrays['pairwise_matrices'] = calculate_pairwise_tensor(decision_matrix[compared], criterion_types)
+        meta = {'companies': companies, 'criterion_names': [c["name"] for c in criteria]}
+        if paged:
+            meta.update(page_info(len(companies), top_k, offset))
+        return binary_response(response_format, arrays, meta)
 
-    # Perform AHP for each criterion
     alternative_weights = []
-    comparisons = {}
-    for criterion_name, matrix in pairwise_comparison_matrices.items():
-        weights, rc = ahp_method(matrix, wd=weight_derivation)
+    for k, criterion in enumerate(criteria):
         alternative_weights.append({
-            "criterion": criterion_name,
-            "weights": weights.tolist(),
-            "consistency_ratio": rc
+            "criterion": criterion["name"],
+            "weights": weights[k].tolist(),
+            "consistency_ratio": float(consistency_ratios[k])
         })
 
-        # Generate textual comparisons for this criterion
-        criterion_comparisons = generate_comparison_text(matrix, [c["name"] for c in company_data])
-        comparisons[criterion_name] = criterion_comparisons
-
     # Calculate the final scores
-    final_scores = aggregate_ahp_scores(company_data, alternative_weights, criteria_weights)
-
-    # Return results
-    return jsonify({
+    final_scores = aggregate_ahp_scores(companies, alternative_weights, criteria_weights, top_k, offset)
+
+    # With top_k/offset, comparisons are generated among the returned companies only (in request order)
+    company_names = [c["name"] for c in companies]
+    if paged:
+        compared = np.sort(rank_ahp_scores(alternative_weights, criteria_weights, top_k, offset)[1])
+        company_names = [company_names[i] for i in compared]
+        if include_comparisons:
+            pairwise_tensor = pairwise_tensor[:, compared][:, :, compared] if pairwise_tensor is not None \
+                else calculate_pairwise_tensor(decision_matrix[compared], criterion_types)
+
+    if stream:
+        def records():
+            scores = {
+                'type': 'scores',
+                'criteria_weights': criteria_weights.tolist(),
+                'alternative_weights': alternative_weights,
+                'aggregated_scores': final_scores
+            }
+            if paged:
+                scores.update(page_info(len(companies), top_k, offset))
+            yield scores
+            if include_comparisons:
+                # One line per company: its comparisons against the companies after it
+                for k, criterion in enumerate(criteria):
+                    for comparisons in iter_comparison_text(pairwise_tensor[k], company_names):
+                        yield {'type': 'comparisons', 'criterion': criterion["name"], 'comparisons': comparisons}
+            yield {'type': 'end'}
+
+        return ndjson_response(records())
+
+    result = {
         'criteria_weights': criteria_weights.tolist(),
         'alternative_weights': alternative_weights,
-        'aggregated_scores': final_scores,
-        'comparisons': comparisons
-    })
+        'aggregated_scores': final_scores
+    }
+    if paged:
+        result.update(page_info(len(companies), top_k, offset))
+    if include_comparisons:
+        # Generate textual comparisons for every criterion
+        result['comparisons'] = {
+            criterion["name"]: generate_comparison_text(pairwise_tensor[k], company_names)
+            for k, criterion in enumerate(criteria)
+        }
+
+    # Return results
+    with Stage('serialize'):
+        return jsonify(result)
 
 
 @app.route('/api/analyze/topsis', methods=['POST'])
+@timed_route('topsis')
+@cached_analysis('topsis')
 def analyze_topsis():
     data = request.json
     selected_companies = data['companies']  # List of selected company IDs
     user_weights = data.get('weights')  # Optional: User-provided weights
+    try:
+        top_k, offset = parse_page(data)  # Only the k best companies after offset
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     # Fetch criteria metadata and determine weights/types
     criteria = list_criteria()
@@ -89,43 +192,62 @@ def analyze_topsis():
     # Use user-provided weights or fallback to default
     weights = user_weights if user_weights else default_weights
 
-    # Fetch company data
-    company_data = fetch_company_data(selected_companies)
+    # Slice the decision matrix from the in-process indicator snapshot (or the history for as_of)
+    try:
+        with Stage('fetch'):
+            companies, decision_matrix = fetch_decision_matrix_as_of(selected_companies, criteria, data.get('as_of'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    record_rows(len(companies))
 
     # Validate data
-    if len(company_data) < 2:
+    if len(companies) < 2:
         return jsonify({'error': 'At least two companies are required for analysis'}), 400
 
-    # Build the decision matrix
-    try:
-        decision_matrix = np.array([
-            [company[criterion["id"]] for criterion in criteria]
-            for company in company_data
-        ])
-    except KeyError as e:
-        return jsonify({'error': f'Missing data for criterion: {str(e)}'}), 400
+    missing_criteria = find_missing_criteria(decision_matrix, criteria)
+    if missing_criteria:
+        return jsonify({'error': f'Missing data for criterion: {", ".join(missing_criteria)}'}), 400
 
     # Perform TOPSIS analysis
     try:
-        relative_closeness = topsis_method(decision_matrix, weights, criterion_types)
+        with Stage('compute'):
+            relative_closeness = topsis_scores(decision_matrix, weights, criterion_types)
     except Exception as e:
         return jsonify({'error': f'Error performing TOPSIS analysis: {str(e)}'}), 500
 
-    # Prepare results
+    response_format = negotiate_format()
+    if response_format != JSON_MIMETYPE:
+        meta = {'companies': companies, 'criterion_names': criterion_names, 'criterion_types': criterion_types}
+        if top_k is not None or offset:
+            meta.update(page_info(len(companies), top_k, offset))
+        return binary_response(response_format, {
+            'company_ids': np.array([c["id"] for c in companies]),
+            'weights': np.asarray(weights, dtype=float),
+            'scores': relative_closeness,
+            'ranking': top_k_indices(relative_closeness, top_k, offset)
+        }, meta)
+
+    # Prepare results, only for the requested page
     ranked_companies = [
-        {"name": company_data[i]["name"], "symbol": company_data[i]["symbol"], "score": relative_closeness[i], "rank": rank + 1}
-        for rank, i in enumerate(np.argsort(-relative_closeness))
+        {"name": companies[i]["name"], "symbol": companies[i]["symbol"], "score": relative_closeness[i], "rank": offset + rank + 1}
+        for rank, i in enumerate(top_k_indices(relative_closeness, top_k, offset))
     ]
 
-    return jsonify({
+    result = {
         'weights': weights,
         'criterion_types': criterion_types,
         'criterion_names': criterion_names,
         'ranked_companies': ranked_companies
-    })
+    }
+    if top_k is not None or offset:
+        result.update(page_info(len(companies), top_k, offset))
+    with Stage('serialize'):
+        return jsonify(result)
 
 
 @app.route('/api/analyze/promethee', methods=['POST'])
+@timed_route('promethee')
+@cached_analysis('promethee')
 def analyze_promethee():
     data = request.json
     selected_companies = data['companies']  # List of selected company IDs
@@ -136,58 +258,88 @@ def analyze_promethee():
     P = data.get("P", [0.5] * 10)  # veto
     W = data.get("W", [1.00] * 10)  # weights
     F = data.get("F", ['t5'] * 10)  # preference functions
+    block_size = data.get("block_size", 256)  # rows compared at once, bounds peak memory
+    try:
+        top_k, offset = parse_page(data)  # Only the k best companies after offset
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     criteria = list_criteria()
     criterion_types = [c["type"] for c in criteria]  # 'max' or 'min'
 
-    # Fetch company data
-    company_data = fetch_company_data(selected_companies)
+    # Slice the decision matrix from the in-process indicator snapshot (or the history for as_of)
+    try:
+        with Stage('fetch'):
+            companies, decision_matrix = fetch_decision_matrix_as_of(selected_companies, criteria, data.get('as_of'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    record_rows(len(companies))
 
     # Validate data
-    if len(company_data) < 2:
+    if len(companies) < 2:
         return jsonify({'error': 'At least two companies are required for analysis'}), 400
 
-    # Build the decision matrix
-    try:
-        decision_matrix = np.array([
-            [company[criterion["id"]] for criterion in criteria]
-            for company in company_data
-        ])
-    except KeyError as e:
-        return jsonify({'error': f'Missing data for criterion: {str(e)}'}), 400
+    missing_criteria = find_missing_criteria(decision_matrix, criteria)
+    if missing_criteria:
+        return jsonify({'error': f'Missing data for criterion: {", ".join(missing_criteria)}'}), 400
 
     # Apply the custom Min-Max scaler
     normalized_matrix = min_max_normalisation(decision_matrix, criterion_types)
 
     # Vnesemo podatke za PROMETHEE
-    scores = promethee_ii(normalized_matrix, W=W, Q=Q, S=S, P=P, F=F, sort=True, topn=10, graph=True, verbose=True)
-
-    scores = scores.tolist()
-
-    # Map company names to company numbers (1 to N)
-    company_names = [company["name"] for company in company_data]
-
-    # Combine company numbers with their respective scores
+    try:
+        # One weight vector, so the response has one flow per company
+        if np.ndim(W) != 1:
+            raise ValueError("W, Q, S, P and F must have one value per criterion.")
+        if not np.all(np.isfinite(np.asarray(W, dtype=float))) or np.sum(W) <= 0:
+            raise ValueError("W must be finite with a positive sum.")
+        with Stage('compute'):
+            flows = promethee_ii_flows(normalized_matrix, W=W, Q=Q, S=S, P=P, F=F, block_size=int(block_size))
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Invalid PROMETHEE parameters: {str(e)}'}), 400
+
+    response_format = negotiate_format()
+    if response_format != JSON_MIMETYPE:
+        meta = {'companies': companies}
+        if top_k is not None or offset:
+            meta.update(page_info(len(companies), top_k, offset))
+        return binary_response(response_format, {
+            'company_ids': np.array([c["id"] for c in companies]),
+            'scores': flows,
+            'ranking': top_k_indices(flows, top_k, offset)
+        }, meta)
+
+    # Sort by net flow in descending order, alternatives are company numbers (1 to N)
     company_scores = []
-    for score in scores:
+    for i in top_k_indices(flows, top_k, offset):
         company_scores.append({
-            "company_name": company_names[int(score[0]) - 1],  # Company name
-            "alternative": int(score[0]),
-            "score": score[1]
+            "company_name": companies[i]["name"],  # Company name
+            "alternative": int(i) + 1,
+            "score": float(flows[i])
         })
 
     # Vrnemo rezultate v JSON obliki
-    return jsonify({
+    result = {
         'scores': company_scores
-    })
+    }
+    if top_k is not None or offset:
+        result.update(page_info(len(companies), top_k, offset))
+    with Stage('serialize'):
+        return jsonify(result)
 
 
 @app.route('/api/analyze/waspas', methods=['POST'])
+@timed_route('waspas')
+@cached_analysis('waspas')
 def analyze_waspas():
     data = request.json
     selected_companies = data['companies']  # List of selected company IDs
     user_weights = data.get('weights')  # User-provided weights
     lambda_value = data.get("lambda_value", 0.5)  # Default lambda value (weight given to WSM and WPM method)
+    try:
+        top_k, offset = parse_page(data)  # Only the k best companies after offset
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     # Fetch criteria metadata and determine weights/types
     criteria = list_criteria()
@@ -197,28 +349,43 @@ def analyze_waspas():
     # Use user-provided weights or fallback to default
     weights = user_weights if user_weights else default_weights
 
-    # Fetch company data
-    company_data = fetch_company_data(selected_companies)
+    # Slice the decision matrix from the in-process indicator snapshot (or the history for as_of)
+    try:
+        with Stage('fetch'):
+            companies, decision_matrix = fetch_decision_matrix_as_of(selected_companies, criteria, data.get('as_of'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    record_rows(len(companies))
 
     # Validate data
-    if len(company_data) < 2:
+    if len(companies) < 2:
         return jsonify({'error': 'At least two companies are required for analysis'}), 400
 
-    # Build the decision matrix
-    try:
-        decision_matrix = np.array([
-            [company[criterion["id"]] for criterion in criteria]
-            for company in company_data
-        ])
-    except KeyError as e:
-        return jsonify({'error': f'Missing data for criterion: {str(e)}'}), 400
+    missing_criteria = find_missing_criteria(decision_matrix, criteria)
+    if missing_criteria:
+        return jsonify({'error': f'Missing data for criterion: {", ".join(missing_criteria)}'}), 400
 
     # Validation (Ensure dataset shape, weights, and criterion_type consistency)
     if len(criterion_types) != decision_matrix.shape[1] or len(weights) != decision_matrix.shape[1]:
         return jsonify({'error': 'The number of criteria must match the dataset dimensions'}), 400
 
     # Call WASPAS method
-    wsm, wpm, waspas = waspas_method(decision_matrix, criterion_types, weights, lambda_value, graph=True)
+    with Stage('compute'):
+        wsm, wpm, waspas = waspas_scores(decision_matrix, criterion_types, weights, lambda_value)
+
+    # Binary formats carry the unrounded scores
+    response_format = negotiate_format()
+    if response_format != JSON_MIMETYPE:
+        meta = {'companies': companies}
+        if top_k is not None or offset:
+            meta.update(page_info(len(companies), top_k, offset))
+        return binary_response(response_format, {
+            'company_ids': np.array([c["id"] for c in companies]),
+            'wsm': np.asarray(wsm, dtype=float),
+            'wpm': np.asarray(wpm, dtype=float),
+            'waspas': np.asarray(waspas, dtype=float),
+            'ranking': top_k_indices(waspas, top_k, offset)
+        }, meta)
 
     # Round the results to 3 decimals
     wsm = [round(score, 3) for score in wsm]
@@ -226,25 +393,214 @@ def analyze_waspas():
     waspas = [round(score, 3) for score in waspas]
 
     # Map company names to the results
-    company_names = [company["name"] for company in company_data]  # Extract company names
-    company_symbols = [company["symbol"] for company in company_data]
+    company_names = [company["name"] for company in companies]  # Extract company names
+    company_symbols = [company["symbol"] for company in companies]
 
-    # Create lists of results with company names
-    wsm_results = [{"company_name": company_names[i], "company_symbol": company_symbols[i], "score": wsm[i]} for i in range(len(company_names))]
-    wpm_results = [{"company_name": company_names[i], "company_symbol": company_symbols[i], "score": wpm[i]} for i in range(len(company_names))]
-    waspas_results = [{"company_name": company_names[i], "company_symbol": company_symbols[i], "score": waspas[i]} for i in range(len(company_names))]
-
-    # Sort the results based on the score in descending order
-    wsm_results = sorted(wsm_results, key=lambda x: x['score'], reverse=True)
-    wpm_results = sorted(wpm_results, key=lambda x: x['score'], reverse=True)
-    waspas_results = sorted(waspas_results, key=lambda x: x['score'], reverse=True)
+    # Create lists of results with company names, sorted by score in descending order (only the requested page)
+    wsm_results = [{"company_name": company_names[i], "company_symbol": company_symbols[i], "score": wsm[i]} for i in top_k_indices(wsm, top_k, offset)]
+    wpm_results = [{"company_name": company_names[i], "company_symbol": company_symbols[i], "score": wpm[i]} for i in top_k_indices(wpm, top_k, offset)]
+    waspas_results = [{"company_name": company_names[i], "company_symbol": company_symbols[i], "score": waspas[i]} for i in top_k_indices(waspas, top_k, offset)]
 
     # Return the results in JSON format
-    return jsonify({
+    result = {
         'WSM_result': wsm_results,  # Weighted Sum Model result
         'WPM_result': wpm_results,  # Weighted Product Model result
         'WASPAS_result': waspas_results  # WASPAS combined result
-    })
+    }
+    if top_k is not None or offset:
+        result.update(page_info(len(companies), top_k, offset))
+    with Stage('serialize'):
+        return jsonify(result)
+
+
+@app.route('/api/analyze/batch', methods=['POST'])
+@timed_route('batch')
+@cached_analysis('batch')
+def analyze_batch():
+    data = request.json
+    selected_companies = data['companies']  # List of selected company IDs
+    scenarios = data.get('scenarios', [])  # List of {method, weights, lambda_value, Q, S, P, W, F, pairwise_matrix, ...}
+
+    if not isinstance(scenarios, list) or not scenarios:
+        return jsonify({'error': 'At least one scenario is required'}), 400
+
+    criteria = list_criteria()
+
+    # The decision matrix is built once (as of the optional as_of) and shared by all scenarios
+    try:
+        with Stage('fetch'):
+            companies, decision_matrix = fetch_decision_matrix_as_of(selected_companies, criteria, data.get('as_of'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    record_rows(len(companies))
+
+    # Validate data
+    if len(companies) < 2:
+        return jsonify({'error': 'At least two companies are required for analysis'}), 400
+
+    missing_criteria = find_missing_criteria(decision_matrix, criteria)
+    if missing_criteria:
+        return jsonify({'error': f'Missing data for criterion: {", ".join(missing_criteria)}'}), 400
+
+    # Evaluate all scenarios; scores follow the order of 'companies', rankings list company IDs best first
+    with Stage('compute'):
+        results = evaluate_scenarios(decision_matrix, criteria, [company["id"] for company in companies], scenarios)
+
+    with Stage('serialize'):
+        return jsonify({
+            'companies': companies,
+            'criterion_names': [c["name"] for c in criteria],
+            'results': results
+        })
+
+
+@app.route('/api/analyze/sensitivity', methods=['POST'])
+@timed_route('sensitivity')
+@cached_analysis('sensitivity')
+def analyze_sensitivity():
+    data = request.json
+    selected_companies = data['companies']  # List of selected company IDs
+    user_weights = data.get('weights')  # Optional: base weights
+    method = data.get('method', 'topsis')  # 'topsis', 'waspas', 'wsm' or 'wpm'
+    mode = data.get('mode', 'one_at_a_time')  # 'one_at_a_time' or 'dirichlet'
+    config = app.config
+
+    criteria = list_criteria()
+    criterion_types = [c["type"] for c in criteria]  # 'max' or 'min'
+    weights = user_weights if user_weights else [1 / len(criteria)] * len(criteria)
+
+    # Sample budget and fan-out, capped by the configured limits
+    try:
+        steps = min(max(int(data.get('steps', 21)), 2), config['SENSITIVITY_MAX_STEPS'])
+        samples = min(max(int(data.get('samples', 1000)), 1), config['SENSITIVITY_MAX_SAMPLES'])
+        workers = min(max(int(data.get('workers', 1)), 1), config['SENSITIVITY_MAX_WORKERS'])
+        lambda_value = float(data.get('lambda_value', 0.5))
+        concentration = float(data.get('concentration', 1.0))
+        seed = int(data['seed']) if data.get('seed') is not None else 0  # Fixed: the result is cached
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid sensitivity parameters'}), 400
+
+    # Slice the decision matrix from the in-process indicator snapshot (or the history for as_of)
+    try:
+        with Stage('fetch'):
+            companies, decision_matrix = fetch_decision_matrix_as_of(selected_companies, criteria, data.get('as_of'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    record_rows(len(companies))
+
+    # Validate data
+    if len(companies) < 2:
+        return jsonify({'error': 'At least two companies are required for analysis'}), 400
+
+    missing_criteria = find_missing_criteria(decision_matrix, criteria)
+    if missing_criteria:
+        return jsonify({'error': f'Missing data for criterion: {", ".join(missing_criteria)}'}), 400
+
+    try:
+        with Stage('compute'):
+            analysis = sensitivity_analysis(decision_matrix, criterion_types, weights, method=method, mode=mode,
+                                            lambda_value=lambda_value, steps=steps, samples=samples,
+                                            concentration=concentration, seed=seed, workers=workers)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Per company: base rank, rank distribution over all weight vectors and rank-reversal thresholds
+    rank_numbers = np.arange(1, len(companies) + 1)
+    results = []
+    for i, company in enumerate(companies):
+        counts = analysis["rank_counts"][i]
+        result = {
+            **company,
+            "base_rank": int(analysis["base_ranks"][i]) + 1,
+            "mean_rank": float(counts @ rank_numbers / counts.sum()),
+            "rank_frequency": (counts / counts.sum()).tolist()
+        }
+        if analysis["thresholds"] is not None:
+            result["rank_reversal"] = {
+                criterion["id"]: {"below": analysis["thresholds"][k][i][0], "above": analysis["thresholds"][k][i][1]}
+                for k, criterion in enumerate(criteria)
+            }
+        results.append(result)
+
+    with Stage('serialize'):
+        return jsonify({
+            'method': method,
+            'mode': mode,
+            'samples': analysis["samples"],
+            'criterion_names': [c["name"] for c in criteria],
+            'companies': sorted(results, key=lambda x: x["base_rank"])
+        })
+
+
+@app.route('/api/screen', methods=['POST'])
+@timed_route('screen')
+@cached_analysis('screen')
+def screen_companies():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'The request body must be a JSON object'}), 400
+    method = data.get('method', 'topsis')  # 'topsis', 'wsm', 'wpm' or 'waspas'
+    user_weights = data.get('weights')  # Optional: User-provided weights
+
+    criteria = list_criteria()
+    criterion_types = [c["type"] for c in criteria]  # 'max' or 'min'
+    weights = user_weights if user_weights else [1 / len(criteria)] * len(criteria)
+
+    if method not in SCREEN_METHODS:
+        return jsonify({'error': f"Invalid method '{method}'. Use one of: {', '.join(SCREEN_METHODS)}."}), 400
+    # Weights, page, filters (Fortune rank range, indicator bounds) and WASPAS lambda
+    try:
+        if not isinstance(weights, list) or len(weights) != len(criteria):
+            raise ValueError('The number of weights must match the number of criteria')
+        weights = [float(weight) for weight in weights]
+        top_k, offset = parse_page(data)
+        rank_range, bounds = parse_filters(data.get('filters'), criteria)
+        lambda_value = float(data.get('lambda_value', 0.5))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    top_k = top_k or DEFAULT_TOP_K
+
+    # Filter the whole universe of the indicator snapshot with one vectorized mask
+    with Stage('fetch'):
+        snapshot = get_indicator_snapshot()
+        universe = snapshot.full_decision_matrix(criteria)
+    with Stage('filter'):
+        mask, complete = screen_mask(universe, snapshot.ranks, rank_range, bounds)
+        rows = np.flatnonzero(mask)
+    record_rows(len(rows))
+
+    if len(rows) < 2:
+        return jsonify({'error': 'At least two companies with complete data must pass the filters'}), 400
+
+    try:
+        with Stage('compute'):
+            scores = screen_scores(universe[rows], criterion_types, weights, method, lambda_value)
+    except Exception as e:
+        return jsonify({'error': f'Error performing {method} screening: {str(e)}'}), 500
+
+    # Result rows only for the requested page
+    ranked_companies = []
+    for position, i in enumerate(top_k_indices(scores, top_k, offset)):
+        row = rows[i]
+        ranked_companies.append({
+            "id": int(snapshot.company_ids[row]),
+            "name": snapshot.names[row],
+            "symbol": snapshot.symbols[row],
+            "fortune_rank": None if np.isnan(snapshot.ranks[row]) else int(snapshot.ranks[row]),
+            "score": float(scores[i]),
+            "rank": offset + position + 1
+        })
+
+    with Stage('serialize'):
+        return jsonify({
+            'method': method,
+            'weights': weights,
+            'criterion_names': [c["name"] for c in criteria],
+            'universe': len(universe),  # Companies in the snapshot
+            'incomplete': int(np.count_nonzero(~complete)),  # Left out for missing indicators
+            **page_info(len(rows), top_k, offset),
+            'ranked_companies': ranked_companies
+        })
 
 
 @app.route('/api/companies', methods=['GET'])
@@ -277,13 +633,25 @@ def get_methods():
     return jsonify(methods)
 
 
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    # Hit/miss counters and size of the analyze result cache
+    cache = get_result_cache()
+    return jsonify(cache.stats() if cache else {"backend": "none"})
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Latency histograms per analyze method and stage, request and row counters (Prometheus text format)
+    return app.response_class(get_metrics_registry().render(), content_type=PROMETHEUS_MIMETYPE)
+
+
 @app.route('/api/company/<int:company_id>', methods=['GET'])
 def get_company_overview(company_id):
-    # Fetch company data
-    company = Company.query.get_or_404(company_id)
-
-    # Fetch related financial indicators
-    financial_data = FinancialIndicator.query.filter_by(company_id=company.id).first()
+    # Fetch company data and related financial indicators in a single query
+    company, financial_data = db.session.query(Company, FinancialIndicator).join(
+        FinancialIndicator, FinancialIndicator.company_id == Company.id
+    ).filter(Company.id == company_id).order_by(FinancialIndicator.id).first_or_404()
 
     # Structure the response
     response = {
@@ -312,3 +680,10 @@ def get_company_overview(company_id):
     }
 
     return jsonify(response)
+
+
+@app.route('/api/company/<int:company_id>/history', methods=['GET'])
+def get_company_history(company_id):
+    # Recorded criteria values of the company over time, oldest first
+    Company.query.get_or_404(company_id)
+    return jsonify({"company_id": company_id, "history": company_history(company_id)})
@@ -0,0 +1,95 @@
+import time
+import warnings
+
+import numpy as np
+from pyDecision.algorithm import ahp_method
+
+from helpers.ahp import RANDOM_INDEX, derive_ahp_weights, power_iteration
+from helpers.mcda_helpers import calculate_pairwise_tensor, list_criteria
+
+
+# Reference: pyDecision's ahp_method up to its random index table (n <= 15), past it the same formulas with
+# np.linalg.eig and the last table entry
+def reference_ahp(X, weight_derivation):
+    n = X.shape[0]
+    if n < len(RANDOM_INDEX):
+        return ahp_method(X, wd=weight_derivation)
+
+    if weight_derivation == 'max_eigen':
+        eigenvalues, eigenvectors = np.linalg.eig(X)
+        index = np.argmax(np.real(eigenvalues))
+        lamb_max = np.real(eigenvalues[index])
+        weights = np.real(eigenvectors[:, index])
+        weights = weights / weights.sum()
+    elif weight_derivation == 'mean':
+        weights = np.mean(X / np.sum(X, axis=0), axis=1)
+        lamb_max = np.mean(np.sum(X * weights, axis=1) / weights)
+    else:
+        return None  # pyDecision's product of the row overflows for large n
+    return weights, (lamb_max - n) / (n - 1) / RANDOM_INDEX[-1]
+
+
+def synthetic_tensor(n, seed=0):
+    rng = np.random.default_rng(seed)
+    criteria = list_criteria()
+    return calculate_pairwise_tensor(rng.lognormal(mean=1, sigma=1, size=(n, len(criteria))),
+                                     [c["type"] for c in criteria])
+
+
+def synthetic_reciprocal(n, seed=0):
+    # Random (inconsistent) Saaty-scale matrix, like a criteria matrix entered by hand
+    rng = np.random.default_rng(seed)
+    scale = np.array([1 / 9, 1 / 7, 1 / 5, 1 / 3, 1, 3, 5, 7, 9])
+    upper = np.triu(rng.choice(scale, size=(n, n)), 1)
+    lower = np.tril(1 / np.where(upper == 0, 1, upper).T, -1)
+    return upper + lower + np.eye(n)
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def run(sizes=(10, 15, 100, 500)):
+    warnings.filterwarnings('ignore', category=RuntimeWarning)
+    print("Alternative matrices of all criteria (criteria x n x n), in-repo batch vs per-matrix reference")
+    print(f"{'n':>6} {'method':>10} {'reference [ms]':>15} {'in-repo [ms]':>13} {'iterations':>11} "
+          f"{'max |dw|':>9} {'max |dCR|':>10}")
+    for n in sizes:
+        tensor = synthetic_tensor(n)
+        repeat = 1 if n > 200 else 3
+        for weight_derivation in ('mean', 'geometric', 'max_eigen'):
+            reference_time, reference = best_of(
+                lambda: [reference_ahp(matrix, weight_derivation) for matrix in tensor], repeat)
+            repo_time, (weights, consistency_ratios) = best_of(
+                lambda: derive_ahp_weights(tensor, weight_derivation), repeat)
+            iterations = power_iteration(tensor)[2] if weight_derivation == 'max_eigen' else ''
+
+            if any(result is None for result in reference):
+                weight_error = consistency_error = float('nan')
+            else:
+                weight_error = max(np.max(np.abs(weights[k] - result[0])) for k, result in enumerate(reference))
+                consistency_error = max(abs(consistency_ratios[k] - result[1]) for k, result in enumerate(reference))
+            print(f"{n:>6} {weight_derivation:>10} {reference_time * 1000:>15.2f} {repo_time * 1000:>13.2f} "
+                  f"{iterations:>11} {weight_error:>9.1e} {consistency_error:>10.1e}")
+
+    # Hand-entered criteria matrices are far less consistent than the generated alternative matrices
+    errors = {weight_derivation: 0.0 for weight_derivation in ('mean', 'geometric', 'max_eigen')}
+    for seed in range(200):
+        matrix = synthetic_reciprocal(3 + seed % 13, seed)
+        for weight_derivation in errors:
+            weights, consistency_ratios = derive_ahp_weights(matrix[np.newaxis], weight_derivation)
+            reference_weights, reference_ratio = ahp_method(matrix, wd=weight_derivation)
+            errors[weight_derivation] = max(errors[weight_derivation], np.max(np.abs(weights[0] - reference_weights)),
+                                            abs(consistency_ratios[0] - reference_ratio))
+    print("Random reciprocal matrices (n = 3..15) vs pyDecision, max difference: " +
+          ', '.join(f'{weight_derivation} {error:.1e}' for weight_derivation, error in errors.items()))
+
+
+# Run from the backend folder: python -m benchmarks.ahp_weights
+if __name__ == '__main__':
+    run()
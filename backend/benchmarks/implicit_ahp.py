@@ -0,0 +1,56 @@
+import time
+import warnings
+
+import numpy as np
+
+from helpers.ahp import derive_ahp_weights, derive_implicit_ahp_weights
+from helpers.mcda_helpers import calculate_pairwise_tensor, list_criteria
+
+
+# The dense tensor takes criteria x n x n floats: past this size only the implicit path is timed
+DENSE_LIMIT = 1000
+
+
+def synthetic_decision_matrix(n, seed=0):
+    rng = np.random.default_rng(seed)
+    criteria = list_criteria()
+    return rng.lognormal(mean=1, sigma=1, size=(n, len(criteria))), [c["type"] for c in criteria]
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def dense_ahp(decision_matrix, criterion_types, weight_derivation):
+    return derive_ahp_weights(calculate_pairwise_tensor(decision_matrix, criterion_types), weight_derivation)
+
+
+def run(sizes=(100, 500, 1000, 5000, 20000)):
+    warnings.filterwarnings('ignore', category=RuntimeWarning)
+    print("Alternative weights of all criteria from the decision matrix: dense tensor vs implicit matrices")
+    print(f"{'n':>6} {'method':>10} {'dense [ms]':>11} {'implicit [ms]':>14} {'max |dw|':>9} {'max |dCR|':>10}")
+    for n in sizes:
+        decision_matrix, criterion_types = synthetic_decision_matrix(n)
+        repeat = 1 if n > 200 else 3
+        for weight_derivation in ('mean', 'geometric', 'max_eigen'):
+            implicit_time, (weights, consistency_ratios) = best_of(
+                lambda: derive_implicit_ahp_weights(decision_matrix, criterion_types, weight_derivation), repeat)
+            if n <= DENSE_LIMIT:
+                dense_time, (dense_weights, dense_ratios) = best_of(
+                    lambda: dense_ahp(decision_matrix, criterion_types, weight_derivation), repeat)
+                weight_error = np.max(np.abs(weights - dense_weights))
+                consistency_error = np.max(np.abs(consistency_ratios - dense_ratios))
+            else:
+                dense_time = weight_error = consistency_error = float('nan')
+            print(f"{n:>6} {weight_derivation:>10} {dense_time * 1000:>11.2f} {implicit_time * 1000:>14.2f} "
+                  f"{weight_error:>9.1e} {consistency_error:>10.1e}")
+
+
+# Run from the backend folder: python -m benchmarks.implicit_ahp
+if __name__ == '__main__':
+    run()
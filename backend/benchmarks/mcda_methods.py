@@ -0,0 +1,64 @@
+import contextlib
+import io
+import time
+
+import matplotlib
+
+matplotlib.use('Agg')  # Headless, like the server
+import matplotlib.pyplot as plt
+import numpy as np
+from pyDecision.algorithm import promethee_ii, topsis_method, waspas_method
+
+from helpers.mcda_helpers import list_criteria
+from helpers.mcda_methods import promethee_ii_flows, topsis_scores, waspas_scores
+
+
+def synthetic_decision_matrix(n, seed=0):
+    rng = np.random.default_rng(seed)
+    criteria = list_criteria()
+    return rng.lognormal(mean=1, sigma=1, size=(n, len(criteria))), [c["type"] for c in criteria]
+
+
+def timed(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # pyDecision prints the scores and draws the ranking when graph/verbose are on
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func()
+        plt.close('all')
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def run(sizes=(10, 100, 500, 2000)):
+    print(f"{'n':>6} {'method':>7} {'pyDecision [s]':>15} {'graph=True [s]':>15} {'native [s]':>11} {'max abs diff':>13}")
+    for n in sizes:
+        X, types = synthetic_decision_matrix(n)
+        weights = np.full(X.shape[1], 1 / X.shape[1])
+
+        library_time, expected = timed(lambda: topsis_method(X, weights, types, graph=False, verbose=False))
+        graph_time, _ = timed(lambda: topsis_method(X, weights, types), repeat=1)
+        native_time, actual = timed(lambda: topsis_scores(X, weights, types), repeat=10)
+        print(f"{n:>6} {'TOPSIS':>7} {library_time:>15.5f} {graph_time:>15.5f} {native_time:>11.5f} {np.max(np.abs(expected - actual)):>13.2e}")
+
+        library_time, expected = timed(lambda: waspas_method(X, types, weights, 0.5, graph=False))
+        graph_time, _ = timed(lambda: waspas_method(X, types, weights, 0.5), repeat=1)
+        native_time, actual = timed(lambda: waspas_scores(X, types, weights, 0.5), repeat=10)
+        diff = max(np.max(np.abs(e - a)) for e, a in zip(expected, actual))
+        print(f"{n:>6} {'WASPAS':>7} {library_time:>15.5f} {graph_time:>15.5f} {native_time:>11.5f} {diff:>13.2e}")
+
+        # pyDecision's PROMETHEE II loops over all pairs in Python, so it is only compared on smaller sets
+        if n <= 500:
+            m = X.shape[1]
+            W, Q, S, P, F = [1.0] * m, [0.2] * m, [0.4] * m, [0.5] * m, ['t5'] * m
+            normalized = (X - X.min(axis=0)) / (X.max(axis=0) - X.min(axis=0))
+            library_time, expected = timed(lambda: promethee_ii(normalized, W, Q, S, P, F, sort=False, verbose=False), repeat=1)
+            native_time, actual = timed(lambda: promethee_ii_flows(normalized, W, Q, S, P, F), repeat=3)
+            diff = np.max(np.abs(expected[:, 1] - actual))
+            print(f"{n:>6} {'PROM II':>7} {library_time:>15.5f} {'-':>15} {native_time:>11.5f} {diff:>13.2e}")
+
+
+# Run from the backend folder: python -m benchmarks.mcda_methods
+if __name__ == '__main__':
+    run()
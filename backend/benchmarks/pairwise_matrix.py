@@ -0,0 +1,68 @@
+import time
+
+import numpy as np
+
+from helpers.mcda_helpers import calculate_pairwise_matrix, map_to_intensity
+
+
+# Reference implementation: the original per-pair loop the vectorized version replaced
+def loop_pairwise_matrix(data, criterion_type):
+    n = len(data)
+    matrix = np.ones((n, n))
+
+    for i in range(n):
+        for j in range(i + 1, n):
+            if data[i] == 0 or data[j] == 0:
+                intensity = 1
+            else:
+                ratio = abs(abs(data[i]) - abs(data[j])) / max(abs(data[i]), abs(data[j]))
+                intensity = map_to_intensity(ratio)
+
+            if criterion_type == "max":
+                better, worse = abs(data[i]) > abs(data[j]), abs(data[i]) < abs(data[j])
+            else:
+                better, worse = abs(data[i]) < abs(data[j]), abs(data[i]) > abs(data[j])
+
+            if better:
+                matrix[i][j] = intensity
+                matrix[j][i] = 1 / intensity
+            elif worse:
+                matrix[i][j] = 1 / intensity
+                matrix[j][i] = intensity
+
+    return matrix
+
+
+def synthetic_values(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # Revenue-like lognormal values with some ties, zeros and negatives mixed in
+    values = np.round(rng.lognormal(mean=11, sigma=1.2, size=n), 1)
+    values[rng.choice(n, size=max(1, n // 50), replace=False)] = 0
+    values[rng.choice(n, size=max(1, n // 20), replace=False)] *= -1
+    values[-1] = values[0]
+    return values.tolist()
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def run(sizes=(50, 500, 2000)):
+    print(f"{'n':>6} {'type':>5} {'loop [s]':>10} {'numpy [s]':>10} {'speedup':>9} identical")
+    for n in sizes:
+        values = synthetic_values(n)
+        for criterion_type in ("max", "min"):
+            loop_time, expected = best_of(lambda: loop_pairwise_matrix(values, criterion_type), 1 if n > 500 else 3)
+            numpy_time, actual = best_of(lambda: calculate_pairwise_matrix(values, criterion_type), 5)
+            identical = np.array_equal(expected, actual)
+            print(f"{n:>6} {criterion_type:>5} {loop_time:>10.4f} {numpy_time:>10.4f} {loop_time / numpy_time:>8.1f}x {identical}")
+
+
+# Run from the backend folder: python -m benchmarks.pairwise_matrix
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,75 @@
+import json
+import time
+
+import numpy as np
+
+from helpers.ahp import derive_ahp_weights
+from helpers.mcda_helpers import calculate_pairwise_tensor, list_criteria
+from helpers.response_format import pack_arrow, pack_msgpack, unpack_arrow, unpack_msgpack
+
+
+def synthetic_payload(n, seed=0):
+    # The arrays of an AHP response, including the pairwise matrices (criteria x n x n)
+    rng = np.random.default_rng(seed)
+    criteria = list_criteria()
+    decision_matrix = rng.lognormal(mean=1, sigma=1, size=(n, len(criteria)))
+    pairwise_tensor = calculate_pairwise_tensor(decision_matrix, [c["type"] for c in criteria])
+    weights, consistency_ratios = derive_ahp_weights(pairwise_tensor, 'geometric')
+    criteria_weights = np.full(len(criteria), 1 / len(criteria))
+    scores = criteria_weights @ weights
+    arrays = {
+        'company_ids': np.arange(1, n + 1),
+        'criteria_weights': criteria_weights,
+        'alternative_weights': weights,
+        'consistency_ratios': consistency_ratios,
+        'scores': scores,
+        'ranking': np.argsort(-scores, kind='stable'),
+        'pairwise_matrices': pairwise_tensor
+    }
+    meta = {
+        'companies': [{"id": i, "name": f'Company {i}', "symbol": f'S{i}'} for i in range(1, n + 1)],
+        'criterion_names': [c["name"] for c in criteria]
+    }
+    return arrays, meta
+
+
+def pack_json(arrays, meta):
+    # What the JSON responses do: .tolist() every array, then serialise
+    return json.dumps({**meta, **{name: array.tolist() for name, array in arrays.items()}}).encode()
+
+
+def unpack_json(body):
+    payload = json.loads(body)
+    return {name: np.asarray(value) for name, value in payload.items() if name not in ('companies', 'criterion_names')}
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def run(sizes=(20, 100, 500)):
+    formats = {
+        'json': (pack_json, unpack_json),
+        'msgpack': (pack_msgpack, lambda body: unpack_msgpack(body)[0]),
+        'arrow': (pack_arrow, lambda body: unpack_arrow(body)[0]),
+    }
+    print(f"{'n':>6} {'format':>8} {'size [kB]':>10} {'encode [ms]':>12} {'decode [ms]':>12} identical")
+    for n in sizes:
+        arrays, meta = synthetic_payload(n)
+        repeat = 1 if n > 200 else 5
+        for name, (pack, unpack) in formats.items():
+            encode_time, body = best_of(lambda: pack(arrays, meta), repeat)
+            decode_time, decoded = best_of(lambda: unpack(body), repeat)
+            identical = all(np.array_equal(decoded[key], array) for key, array in arrays.items())
+            print(f"{n:>6} {name:>8} {len(body) / 1024:>10.1f} {encode_time * 1000:>12.2f} {decode_time * 1000:>12.2f} "
+                  f"{identical}")
+
+
+# Run from the backend folder: python -m benchmarks.response_formats
+if __name__ == '__main__':
+    run()
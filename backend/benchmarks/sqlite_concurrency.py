@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from app import db
+from app import models  # noqa: F401 (registers the tables on db.metadata)
+from config import Config
+from helpers.database import MIGRATIONS, register_sqlite_pragmas, sqlite_pragmas
+
+
+# SQLite defaults (rollback journal, fsync on every commit, no indexes) against the app's profile
+PROFILES = {
+    'default': {"pragmas": ['PRAGMA journal_mode=DELETE', 'PRAGMA synchronous=FULL'], "indexes": False},
+    'tuned': {"pragmas": sqlite_pragmas({key: getattr(Config, key) for key in dir(Config) if key.isupper()}),
+              "indexes": True},
+}
+
+INDICATOR_COLUMNS = ['revenue', 'profit', 'profit_change_percentage', 'revenue_change_percentage', 'roe',
+                     'price_to_earnings_ratio', 'stock_volatility', 'dividend_yield', 'earnings_per_share',
+                     'EV_to_EBITDA']
+
+OVERVIEW_QUERY = text(
+    'SELECT companies.*, financial_indicators.* FROM companies JOIN financial_indicators '
+    'ON financial_indicators.company_id = companies.id WHERE companies.id = :id'
+)
+
+
+def connect(path, profile):
+    engine = create_engine(f'sqlite:///{path}')
+    register_sqlite_pragmas(engine, PROFILES[profile]["pragmas"])
+    return engine
+
+
+def seed_database(path, profile, n, seed=0):
+    rng = np.random.default_rng(seed)
+    engine = connect(path, profile)
+    db.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        if not PROFILES[profile]["indexes"]:
+            for name in ('ix_financial_indicators_company_id', 'ix_companies_symbol', 'ix_companies_name'):
+                connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        else:
+            for _, _, statements in MIGRATIONS:
+                for statement in statements:
+                    connection.execute(text(statement))
+
+        connection.execute(text('INSERT INTO companies (id, name, symbol) VALUES (:id, :name, :symbol)'),
+                           [{"id": i, "name": f'Company {i}', "symbol": f'S{i}'} for i in range(1, n + 1)])
+        values = rng.lognormal(size=(n, len(INDICATOR_COLUMNS)))
+        connection.execute(
+            text(f"INSERT INTO financial_indicators (company_id, {', '.join(INDICATOR_COLUMNS)}) "
+                 f"VALUES (:company_id, {', '.join(':' + column for column in INDICATOR_COLUMNS)})"),
+            [{"company_id": i + 1, **dict(zip(INDICATOR_COLUMNS, row.tolist()))} for i, row in enumerate(values)]
+        )
+    engine.dispose()
+
+
+def writer(path, profile, n, stop_at, results):
+    # One ingestion-like transaction after the other: update every company's indicators, then commit
+    engine = connect(path, profile)
+    rng = np.random.default_rng(1)
+    statement = text('UPDATE financial_indicators SET roe = :roe, stock_volatility = :beta WHERE company_id = :id')
+    commits = 0
+    while time.perf_counter() < stop_at:
+        values = rng.random((n, 2))
+        with engine.begin() as connection:
+            connection.execute(statement, [{"id": i + 1, "roe": roe, "beta": beta}
+                                           for i, (roe, beta) in enumerate(values.tolist())])
+        commits += 1
+    results.put(('writer', commits))
+
+
+def reader(path, profile, n, stop_at, results, seed):
+    # Alternates the overview lookup and the decision-matrix query of the analyze routes
+    engine = connect(path, profile)
+    rng = random.Random(seed)
+    analyze = text(f"SELECT companies.id, {', '.join(INDICATOR_COLUMNS)} FROM companies JOIN financial_indicators "
+                   f"ON financial_indicators.company_id = companies.id WHERE companies.id IN "
+                   f"({', '.join(':id' + str(k) for k in range(20))})")
+    latencies = []
+    errors = 0
+    with engine.connect() as connection:
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                if len(latencies) % 2:
+                    connection.execute(OVERVIEW_QUERY, {"id": rng.randint(1, n)}).fetchall()
+                else:
+                    connection.execute(analyze, {f'id{k}': rng.randint(1, n) for k in range(20)}).fetchall()
+                connection.rollback()  # End the read transaction, like a finished request
+            except Exception:
+                errors += 1
+                connection.rollback()
+            latencies.append(time.perf_counter() - start)
+    results.put(('reader', latencies, errors))
+
+
+def run_profile(profile, n, readers, duration):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'mcda.db')
+    try:
+        seed_database(path, profile, n)
+        results = multiprocessing.Queue()
+        stop_at = time.perf_counter() + duration
+        processes = [multiprocessing.Process(target=writer, args=(path, profile, n, stop_at, results))]
+        processes += [multiprocessing.Process(target=reader, args=(path, profile, n, stop_at, results, k))
+                      for k in range(readers)]
+        for process in processes:
+            process.start()
+        outputs = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        shutil.rmtree(directory)
+
+    commits = next(output[1] for output in outputs if output[0] == 'writer')
+    latencies = np.concatenate([output[1] for output in outputs if output[0] == 'reader']) * 1000
+    errors = sum(output[2] for output in outputs if output[0] == 'reader')
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{n:>6} {profile:>8} {len(latencies) / duration:>9.0f} {p50:>8.3f} {p95:>8.3f} {p99:>8.3f} "
+          f"{latencies.max():>9.1f} {errors:>7} {commits / duration:>10.2f}")
+
+
+def run(sizes=(500, 2000), readers=4, duration=5.0):
+    print(f"Read latency with {readers} reader processes while one process commits indicator updates ({duration:.0f} s)")
+    print(f"{'n':>6} {'profile':>8} {'reads/s':>9} {'p50 [ms]':>8} {'p95 [ms]':>8} {'p99 [ms]':>8} "
+          f"{'max [ms]':>9} {'errors':>7} {'commits/s':>10}")
+    for n in sizes:
+        for profile in PROFILES:
+            run_profile(profile, n, readers, duration)
+
+
+# Run from the backend folder: python -m benchmarks.sqlite_concurrency
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timezone
+from importlib.metadata import version
+
+import numpy as np
+from sqlalchemy import text
+
+from config import Config
+
+
+SIZES = (10, 100, 500, 2000)
+
+# Timing rounds per case: at least MIN_ROUNDS and about MIN_TIME seconds, never more than MAX_ROUNDS
+MIN_ROUNDS = 3
+MAX_ROUNDS = 100
+MIN_TIME = 0.5
+
+# A case regresses when its median is more than threshold (relative) and NOISE_FLOOR seconds slower
+DEFAULT_THRESHOLD = 0.25
+NOISE_FLOOR = 0.00005
+
+# Textual AHP comparisons grow with n² per criterion; larger sets are only timed without them
+AHP_COMPARISONS_LIMIT = 500
+
+
+def seed_database(app, n, seed=0):
+    # n synthetic companies with every criterion set, written through the app's engine
+    from app import db
+    from helpers.mcda_helpers import list_criteria
+
+    rng = np.random.default_rng(seed)
+    columns = [criterion["id"] for criterion in list_criteria()]
+    values = rng.lognormal(mean=1, sigma=1, size=(n, len(columns)))
+    # Change percentages can be negative
+    for k, column in enumerate(columns):
+        if column.endswith('_change_percentage'):
+            values[:, k] = rng.normal(loc=5, scale=20, size=n)
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text('INSERT INTO companies (id, name, symbol, rank) VALUES (:id, :name, :symbol, :rank)'),
+                               [{"id": i, "name": f'Company {i}', "symbol": f'S{i}', "rank": i}
+                                for i in range(1, n + 1)])
+            connection.execute(
+                text(f"INSERT INTO financial_indicators (company_id, {', '.join(columns)}) "
+                     f"VALUES (:company_id, {', '.join(':' + column for column in columns)})"),
+                [{"company_id": i + 1, **dict(zip(columns, row.tolist()))} for i, row in enumerate(values)]
+            )
+
+
+def create_benchmark_app(path):
+    # The app on a seeded copy of the schema, without the result cache (every request is computed) and
+    # without the shared matrix and metrics files
+    Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    Config.RESULT_CACHE_BACKEND = 'none'
+    Config.SHARED_MATRIX_DIR = ''
+    Config.METRICS_PATH = ''
+
+    from app import create_app
+    return create_app()
+
+
+def measure(func):
+    func()  # Warm-up: imports, snapshot build, first-call allocations
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < MAX_ROUNDS and (len(timings) < MIN_ROUNDS or time.perf_counter() - started < MIN_TIME):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"median": statistics.median(timings), "min": min(timings), "rounds": len(timings)}
+
+
+def helper_cases(app, n):
+    from helpers.ahp import derive_implicit_ahp_weights
+    from helpers.mcda_helpers import list_criteria, calculate_pairwise_matrix, calculate_all_pairwise_matrices, \
+        build_decision_matrix, min_max_normalisation, aggregate_ahp_scores, fetch_company_data
+
+    criteria = list_criteria()
+    criterion_types = [c["type"] for c in criteria]
+    company_ids = list(range(1, n + 1))
+    with app.app_context():
+        company_data = fetch_company_data(company_ids)
+    decision_matrix = build_decision_matrix(company_data, criteria)
+
+    weights, consistency_ratios = derive_implicit_ahp_weights(decision_matrix, criterion_types)
+    alternative_weights = [{"criterion": c["name"], "weights": weights[k].tolist(),
+                            "consistency_ratio": float(consistency_ratios[k])} for k, c in enumerate(criteria)]
+    criteria_weights = np.full(len(criteria), 1 / len(criteria))
+
+    def fetch():
+        with app.app_context():
+            return fetch_company_data(company_ids)
+
+    return {
+        'calculate_pairwise_matrix': lambda: calculate_pairwise_matrix(decision_matrix[:, 0], criterion_types[0]),
+        'calculate_all_pairwise_matrices': lambda: calculate_all_pairwise_matrices(company_data, criteria),
+        'min_max_normalisation': lambda: min_max_normalisation(decision_matrix, criterion_types),
+        'aggregate_ahp_scores': lambda: aggregate_ahp_scores(company_data, alternative_weights, criteria_weights),
+        'fetch_company_data': fetch,
+    }
+
+
+def route_cases(app, n):
+    from helpers.mcda_helpers import list_criteria
+
+    client = app.test_client()
+    company_ids = list(range(1, n + 1))
+    m = len(list_criteria())
+    pairwise_matrix = np.ones((m, m)).tolist()
+
+    payloads = {
+        'ahp': {"companies": company_ids, "pairwise_matrix": pairwise_matrix, "include_comparisons": False},
+        'topsis': {"companies": company_ids},
+        'promethee': {"companies": company_ids},
+        'waspas': {"companies": company_ids},
+        'batch': {"companies": company_ids, "scenarios": [
+            {"method": 'ahp', "pairwise_matrix": pairwise_matrix}, {"method": 'topsis'},
+            {"method": 'waspas'}, {"method": 'promethee'}
+        ]},
+        'sensitivity': {"companies": company_ids, "method": 'topsis', "steps": 21},
+    }
+    if n <= AHP_COMPARISONS_LIMIT:
+        payloads['ahp_comparisons'] = {"companies": company_ids, "pairwise_matrix": pairwise_matrix}
+
+    def post(path, payload):
+        def request():
+            response = client.post(path, json=payload)
+            if response.status_code != 200:
+                raise RuntimeError(f'{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+            return response
+        return request
+
+    return {
+        f'route_{name}': post(f"/api/analyze/{name.split('_')[0]}", payload) for name, payload in payloads.items()
+    }
+
+
+def run(sizes=SIZES, only=None):
+    """
+    Time every case at every size.
+
+    :param sizes: Numbers of companies.
+    :param only: Substring filter on the case names (None for all).
+    :return: Results document: environment and {case: {n: {median, min, rounds}}} in seconds.
+    """
+    warnings.filterwarnings('ignore', category=RuntimeWarning)
+    directory = tempfile.mkdtemp()
+    try:
+        app = create_benchmark_app(os.path.join(directory, 'mcda.db'))
+        seed_database(app, max(sizes))
+
+        results = {}
+        for n in sizes:
+            for name, func in {**helper_cases(app, n), **route_cases(app, n)}.items():
+                if only and only not in name:
+                    continue
+                results.setdefault(name, {})[str(n)] = timing = measure(func)
+                print(f"{name:>32} {n:>6} {timing['median'] * 1000:>12.3f} ms  ({timing['rounds']} rounds)",
+                      flush=True)
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pyDecision": version('pyDecision'),
+            "flask": version('flask'),
+            "sqlalchemy": version('sqlalchemy'),
+        },
+        "sizes": list(sizes),
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two results documents.
+
+    :param baseline: Results document of the reference run.
+    :param current: Results document of the new run.
+    :param threshold: Relative slowdown of the median that counts as a regression.
+    :return: List of (case, n, baseline median, current median) regressions.
+    """
+    regressions = []
+    print(f"{'case':>32} {'n':>6} {'baseline [ms]':>14} {'current [ms]':>13} {'ratio':>7}")
+    for name, timings in current["results"].items():
+        for n, timing in timings.items():
+            reference = baseline["results"].get(name, {}).get(n)
+            if reference is None:
+                continue
+            ratio = timing["median"] / reference["median"]
+            regressed = ratio > 1 + threshold and timing["median"] - reference["median"] > NOISE_FLOOR
+            print(f"{name:>32} {n:>6} {reference['median'] * 1000:>14.3f} {timing['median'] * 1000:>13.3f} "
+                  f"{ratio:>7.2f}{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append((name, n, reference["median"], timing["median"]))
+    return regressions
+
+
+# Run from the backend folder: python -m benchmarks.suite --output results.json [--baseline previous.json]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the MCDA helpers and analyze routes.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='numbers of companies')
+    parser.add_argument('--only', help='only run the cases whose name contains this text')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file for the results')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative slowdown flagged as a regression (default: %(default)s)')
+    args = parser.parse_args()
+
+    document = run(args.sizes, args.only)
+    with open(args.output, 'w') as file:
+        json.dump(document, file, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(json.load(file), document, args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression(s) beyond {args.threshold:.0%}')
+            sys.exit(1)
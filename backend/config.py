@@ -11,3 +11,28 @@ class Config:
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(BASE_DIR, "app/mcda.db")}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # SQLite settings applied to every connection (helpers/database.py)
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')  # Readers do not block on the ingestion writer
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # Safe with WAL, no fsync per commit
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Bytes
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -64 * 1024))  # Negative: KiB per connection
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # Milliseconds to wait for a lock
+
+    # Directory of the memory-mapped decision-matrix files shared by the gunicorn workers (empty to disable)
+    SHARED_MATRIX_DIR = os.getenv('SHARED_MATRIX_DIR', os.path.join(BASE_DIR, 'app/shared'))
+
+    # Cache of analyze results: 'memory' (per worker), 'sqlite' (file shared by the workers) or 'none'
+    RESULT_CACHE_BACKEND = os.getenv('RESULT_CACHE_BACKEND', 'memory')
+    RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', os.path.join(BASE_DIR, 'app/shared/result_cache.db'))
+    RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', 300))  # Seconds
+    RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+    # Metrics of the analyze routes, summed over the gunicorn workers in this SQLite file (empty: per process)
+    METRICS_PATH = os.getenv('METRICS_PATH', os.path.join(BASE_DIR, 'app/shared/metrics.db'))
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1.0))  # Seconds between writes per worker
+
+    # Limits of the weight-sensitivity endpoint
+    SENSITIVITY_MAX_SAMPLES = int(os.getenv('SENSITIVITY_MAX_SAMPLES', 100000))
+    SENSITIVITY_MAX_STEPS = int(os.getenv('SENSITIVITY_MAX_STEPS', 1001))
+    # Processes one request may start, in every gunicorn worker: keep it at most cpu_count // gunicorn workers
+    SENSITIVITY_MAX_WORKERS = int(os.getenv('SENSITIVITY_MAX_WORKERS', 1))
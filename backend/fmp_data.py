@@ -1,25 +1,19 @@
-import time
-from urllib.parse import quote
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
-from app import db, create_app
-from app.models import Company, FinancialIndicator
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-
-# API key for Financial Modeling Prep
-API_KEY = os.getenv('FMP_API_KEY')
+from app import create_app
+from app.models import Company
+from helpers.bulk_upsert import format_counts
+from helpers.fmp_client import MAX_WORKERS, fmp_get, fetch_symbols_batched
+from helpers.refresh_planner import plan_refresh, record_fetch, commit_checkpoint, checkpoints
+from helpers.shared_matrix import export_shared_matrix
 
 
 # Function to get data from FMP API
 def get_fmp_data(symbol):
     try:
-        url = f'https://financialmodelingprep.com/api/v3/key-metrics-ttm/{symbol}?apikey={API_KEY}'
-        response = requests.get(url)
-        response.raise_for_status()  # Raise HTTPError for bad HTTP responses
-        data = response.json()
+        data = fmp_get(f'key-metrics-ttm/{symbol}')
 
         if not data or len(data) == 0:  # Handle empty response
             print(f"No data available for symbol {symbol}")
@@ -32,23 +26,14 @@ def get_fmp_data(symbol):
         return None
 
 
-# Function to get Beta from FMP API
-def get_fmp_beta(symbol):
-    try:
-        url = f'https://financialmodelingprep.com/api/v3/profile/{symbol}?apikey={API_KEY}'
-        response = requests.get(url)
-        response.raise_for_status()  # Raise HTTPError for bad HTTP responses
-        data = response.json()
+# Function to get the profiles (with Beta) of many symbols with batched requests
+def get_fmp_profiles(symbols, executor=None):
+    profiles = fetch_symbols_batched('profile', symbols, executor=executor)
 
-        if not data or len(data) == 0:  # Handle empty response
+    for symbol, profile in profiles.items():
+        if not profile:
             print(f"No Beta data available for symbol {symbol}")
-            return None
-
-        # Extract Beta from the first entry
-        return safe_float(data[0].get('beta'))
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching Beta for symbol {symbol}: {e}")
-        return None
+    return profiles
 
 
 # Helper function to safely convert data to float
@@ -61,70 +46,79 @@ def safe_float(value):
         return None
 
 
-# Function to update financial indicators in the database
-def update_financial_indicators(company_id, roe, price_to_earnings_ratio, dividend_yield, volatility, eps,
-                                ev_to_ebitda):
-    company = Company.query.get(company_id)
-
-    if company:
-        financial_indicator = FinancialIndicator.query.filter_by(company_id=company_id).first()
-        if not financial_indicator:
-            financial_indicator = FinancialIndicator(company_id=company_id)
-            db.session.add(financial_indicator)
-
-        # Update only if data is available
-        if roe is not None:
-            financial_indicator.roe = roe
-        if price_to_earnings_ratio is not None:
-            financial_indicator.price_to_earnings_ratio = price_to_earnings_ratio
-        if dividend_yield is not None:
-            financial_indicator.dividend_yield = dividend_yield
-        if volatility is not None:
-            financial_indicator.stock_volatility = volatility
-        if eps is not None:
-            financial_indicator.earnings_per_share = eps
-        if ev_to_ebitda is not None:
-            financial_indicator.EV_to_EBITDA = ev_to_ebitda
-
-
-# Connect to the database and update all companies
-def update_all_companies():
-    companies = Company.query.all()  # Get all companies
-
-    for company in companies:
-        symbol = company.symbol
-
-        # Get data from FMP
-        data = get_fmp_data(symbol)
-        if not data:
-            continue
+# Financial indicator columns filled by each FMP endpoint
+KEY_METRICS_FIELDS = ['roe', 'price_to_earnings_ratio', 'dividend_yield', 'earnings_per_share', 'EV_to_EBITDA']
+PROFILE_FIELDS = ['stock_volatility']
 
-        # Get Beta (Volatility)
-        beta = get_fmp_beta(symbol)
 
-        # Extract relevant fields using safe_float helper
-        roe = safe_float(data.get('roeTTM'))
-        price_to_earnings_ratio = safe_float(data.get('peRatioTTM'))
-        dividend_yield = safe_float(data.get('dividendYieldPercentageTTM'))
-        eps = safe_float(data.get('netIncomePerShareTTM'))
-        ev_to_ebitda = safe_float(data.get('enterpriseValueOverEBITDATTM'))
+# Map the fetched key metrics to financial indicator columns
+def key_metrics_values(data):
+    # Extract relevant fields using safe_float helper
+    return {
+        'roe': safe_float(data.get('roeTTM')),
+        'price_to_earnings_ratio': safe_float(data.get('peRatioTTM')),
+        'dividend_yield': safe_float(data.get('dividendYieldPercentageTTM')),
+        'earnings_per_share': safe_float(data.get('netIncomePerShareTTM')),
+        'EV_to_EBITDA': safe_float(data.get('enterpriseValueOverEBITDATTM')),
+    }
 
-        # Update financial indicators
-        update_financial_indicators(company.id, roe, price_to_earnings_ratio, dividend_yield, beta, eps, ev_to_ebitda)
 
-        print(f"Updated data for {company.name} ({symbol}).")
-        print(roe, price_to_earnings_ratio, dividend_yield, beta, eps, ev_to_ebitda)
-
-        time.sleep(10)
+# Connect to the database and update the companies with stale or missing data
+def update_all_companies(full=False):
+    companies = Company.query.all()  # Get all companies
 
-    db.session.commit()
-    print("FMP data successfully updated.")
+    # Plan each endpoint separately, e.g. only the profile when just the Beta is missing
+    metrics_plan, metrics_log = plan_refresh(companies, 'fmp_key_metrics', KEY_METRICS_FIELDS, full)
+    profile_plan, profile_log = plan_refresh(companies, 'fmp_profile', PROFILE_FIELDS, full)
+    metrics_ids = {company.id for company in metrics_plan}
+    profile_ids = {company.id for company in profile_plan}
+    planned = [company for company in companies if company.id in metrics_ids or company.id in profile_ids]
+    print(f"Refreshing key metrics of {len(metrics_plan)} and profiles of {len(profile_plan)} "
+          f"out of {len(companies)} companies.")
+
+    # Key metrics are only available per symbol; Beta comes from batched profile requests.
+    # All requests share the pool and the rate limiter paces them to the quota.
+    # Database writes stay on this thread and are committed per checkpoint, together with the fetch log,
+    # so a run stopped by a crash or the quota resumes where it stopped.
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for checkpoint in checkpoints(planned):
+            data_futures = [(company, executor.submit(get_fmp_data, company.symbol))
+                            for company in checkpoint if company.id in metrics_ids]
+            profiles = get_fmp_profiles([company.symbol for company in checkpoint if company.id in profile_ids],
+                                        executor)
+
+            values_by_company = {}
+            for company, data_future in data_futures:
+                data = data_future.result()
+                # An unchanged payload would write the stored values again
+                if data and record_fetch(metrics_log, company.id, 'fmp_key_metrics', data):
+                    values_by_company[company.id] = key_metrics_values(data)
+
+            for company in checkpoint:
+                profile = profiles.get(company.symbol) if company.id in profile_ids else None
+                if profile and record_fetch(profile_log, company.id, 'fmp_profile', profile):
+                    values_by_company.setdefault(company.id, {})['stock_volatility'] = safe_float(profile.get('beta'))
+
+                if company.id in values_by_company:
+                    print(f"Updated data for {company.name} ({company.symbol}).")
+                    print(*values_by_company[company.id].values())
+
+            # Update financial indicators, only where data is available
+            commit_checkpoint(values_by_company, counts)
+
+    export_shared_matrix()
+    print(f"FMP data successfully updated ({format_counts(counts)}).")
 
 
 # Run the update function directly
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Update financial indicators from Financial Modeling Prep.')
+    parser.add_argument('--full', action='store_true', help='fetch every company, not only stale or missing data')
+    args = parser.parse_args()
+
     # Create the Flask app and ensure the context is active
     app = create_app()
 
     with app.app_context():
-        update_all_companies()
+        update_all_companies(full=args.full)
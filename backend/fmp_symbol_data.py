@@ -1,24 +1,20 @@
-import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from app import db, create_app
 from app.models import Company
-from dotenv import load_dotenv
-import os
+from helpers.data_version import bump_data_version
+from helpers.fmp_client import MAX_WORKERS, fmp_get
+from helpers.shared_matrix import export_shared_matrix
 
-load_dotenv()
-
-# API key for Financial Modeling Prep
-API_KEY = os.getenv('FMP_API_KEY')
+# Exchanges preferred by the symbol search
+LISTED_EXCHANGES = ["NASDAQ", "NYSE"]
 
 
 # Function to search for symbol by company name
 def search_symbol_by_name(company_name):
     try:
-        url = f'https://financialmodelingprep.com/api/v3/search?query={company_name}&apikey={API_KEY}'
-        response = requests.get(url)
-        response.raise_for_status()  # Raise HTTPError for bad HTTP responses
-        data = response.json()
+        data = fmp_get('search', params={'query': company_name})
 
         if not data or len(data) == 0:  # Handle empty response
             print(f"No symbol found for company {company_name}")
@@ -30,7 +26,7 @@ def search_symbol_by_name(company_name):
             exchange = company['exchangeShortName']
 
             # Check if symbol is from NASDAQ or NYSE
-            if exchange in ["NASDAQ", "NYSE"]:
+            if exchange in LISTED_EXCHANGES:
                 return symbol  # Return the symbol if it's from NASDAQ or NYSE
 
             # If the symbol contains an exchange suffix (e.g., .SS, .SW), strip it
@@ -51,22 +47,31 @@ def search_symbol_by_name(company_name):
 def update_symbol_in_db():
     companies = Company.query.all()  # Get all companies from DB
 
-    for company in companies:
-        company_name = company.name
-        current_symbol = company.symbol
-
-        # Search for the symbol by company name using the FMP API
-        new_symbol = search_symbol_by_name(company_name)
-
-        # If a new symbol is found, and it's different from the current one, update it
-        if new_symbol and new_symbol != current_symbol:
-            print(f"Updating symbol for {company_name} from {current_symbol} to {new_symbol}")
-            company.symbol = new_symbol
-            db.session.commit()
-        else:
-            print(f"No change in symbol for {company_name}")
-
-        time.sleep(10)
+    # Search every company by name; the requests share the pool and the rate limiter paces them to the quota
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        new_symbols = executor.map(search_symbol_by_name, [company.name for company in companies])
+
+        changed = 0
+        for company, new_symbol in zip(companies, new_symbols):
+            company_name = company.name
+            current_symbol = company.symbol
+
+            # If a new symbol is found, and it's different from the current one, update it
+            if new_symbol and new_symbol != current_symbol:
+                print(f"Updating symbol for {company_name} from {current_symbol} to {new_symbol}")
+                company.symbol = new_symbol
+                changed += 1
+            else:
+                print(f"No change in symbol for {company_name}")
+
+    print(f"{changed} of {len(companies)} symbols changed.")
+    if not changed:
+        return
+
+    # Symbols are part of the indicator snapshot
+    bump_data_version()
+    db.session.commit()
+    export_shared_matrix()
 
 
 # Run the update function directly
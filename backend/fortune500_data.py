@@ -1,6 +1,9 @@
 from app import db, create_app
-from app.models import Company, FinancialIndicator
 import json
+from helpers.bulk_upsert import format_counts, insert_companies, upsert_financial_indicators
+from helpers.data_version import bump_data_version
+from helpers.indicator_history import append_indicator_history
+from helpers.shared_matrix import export_shared_matrix
 
 
 # Helper function to convert formatted numbers
@@ -23,42 +26,45 @@ def insert_company_data():
     with open('data/companies.json', 'r') as file:
         fortune_500_data = json.load(file)
 
+    companies = []
+    indicators_by_name = {}
     for company_data in fortune_500_data:
-        # Check if the company already exists (by name or symbol)
-        company = Company.query.filter_by(name=company_data['name']).first()
-        # Create the company object
-        if not company:
-            # If the company doesn't exist, create and insert it
-            company = Company(
-                name=company_data['name'],
-                symbol=company_data['symbol'],
-                rank=int(company_data['rank']),
-                rank_change=company_data['rank_change'],
-                years_in_rank=int(company_data['years_in_rank'])
-            )
-            db.session.add(company)
-            db.session.commit()  # Commit to ensure company.id is generated
+        companies.append({
+            'name': company_data['name'],
+            'symbol': company_data['symbol'],
+            'rank': int(company_data['rank']),
+            'rank_change': company_data['rank_change'],
+            'years_in_rank': int(company_data['years_in_rank'])
+        })
+        indicators_by_name[company_data['name']] = {
+            'revenue': convert_to_number(company_data['revenue']),
+            'profit': convert_to_number(company_data['profit']),
+            'profit_change': company_data['profit_change'],
+            'revenue_change': company_data['revenue_change'],
+            'assets': convert_to_number(company_data['assets']),
+            'employees': int(company_data['employees'].replace(",", "")),
+            'profit_change_percentage': convert_percentage_to_float(company_data['profit_change']),
+            'revenue_change_percentage': convert_percentage_to_float(company_data['revenue_change'])
+        }
 
-            # Now create the financial indicator for the company
-            financial_indicator = FinancialIndicator(
-                company_id=company.id,  # Link the financial indicator to the company
-                revenue=convert_to_number(company_data['revenue']),
-                profit=convert_to_number(company_data['profit']),
-                profit_change=company_data['profit_change'],
-                revenue_change=company_data['revenue_change'],
-                assets=convert_to_number(company_data['assets']),
-                employees=int(company_data['employees'].replace(",", "")),
-                profit_change_percentage=convert_percentage_to_float(company_data['profit_change']),
-                revenue_change_percentage=convert_percentage_to_float(company_data['revenue_change'])
-            )
-            # Add financial indicator to the session
-            db.session.add(financial_indicator)
-            db.session.commit()
+    # Insert the companies that do not exist yet (by name), then their financial indicators
+    company_ids, company_counts = insert_companies(companies)
+    indicator_counts = upsert_financial_indicators({
+        company_id: indicators_by_name[name] for name, company_id in company_ids.items()
+    })
 
-    # Commit all financial indicators at once after all companies are processed
-
-
-    print("Data has been successfully inserted into the database.")
+    # Commit all companies, financial indicators and their history at once after all companies are processed;
+    # an unchanged file keeps the data version, so the snapshots and cached results stay valid
+    written = company_counts["inserted"] + indicator_counts["inserted"] + indicator_counts["updated"]
+    if written:
+        append_indicator_history()
+        bump_data_version()
+        db.session.commit()
+        export_shared_matrix()
+        print("Data has been successfully inserted into the database.")
+    else:
+        print("The database is already up to date.")
+    print(f"Companies: {format_counts(company_counts)}. Financial indicators: {format_counts(indicator_counts)}.")
 
 
 # Run the update function directly
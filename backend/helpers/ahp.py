@@ -0,0 +1,310 @@
+import numpy as np
+
+from helpers.mcda_helpers import INTENSITY_THRESHOLDS, INTENSITY_VALUES
+
+
+# Random consistency index used by pyDecision's ahp_method (indexed by matrix size)
+RANDOM_INDEX = np.array([0, 0, 0, 0.58, 0.9, 1.12, 1.24, 1.32, 1.41, 1.45, 1.49, 1.51, 1.48, 1.56, 1.57, 1.59])
+
+# Power iteration stops once no weight changes by more than this between two steps. Weights then agree with
+# np.linalg.eig (pyDecision's max_eigen) within 1e-11 and consistency ratios within 1e-10 (benchmarks.ahp_weights).
+POWER_ITERATION_TOLERANCE = 1e-12
+POWER_ITERATION_MAX_ITER = 1000
+
+WEIGHT_DERIVATIONS = {'m': 'mean', 'mean': 'mean', 'g': 'geometric', 'geometric': 'geometric',
+                      'me': 'max_eigen', 'max_eigen': 'max_eigen'}
+
+
+def geometric_weights(X):
+    """
+    Normalised geometric mean of each row, computed in log space so large matrices do not overflow.
+
+    :param X: Pairwise matrices (criteria x n x n).
+    :return: Weights (criteria x n).
+    """
+    weights = np.exp(np.mean(np.log(X), axis=2))
+    return weights / np.sum(weights, axis=1, keepdims=True)
+
+
+def power_iteration(X, initial=None, tol=POWER_ITERATION_TOLERANCE, max_iter=POWER_ITERATION_MAX_ITER):
+    """
+    Principal eigenvector and eigenvalue of a stack of positive matrices by power iteration.
+
+    Each step is one batched matrix-vector product, O(n^2) per matrix instead of the O(n^3) of a full
+    eigendecomposition. Matrices leave the batch as soon as they converged. For a positive (reciprocal) matrix
+    the iteration converges to the Perron vector from any positive start; the geometric weights are exact for
+    consistent matrices, so they make a close warm start.
+
+    :param X: Positive matrices (criteria x n x n).
+    :param initial: Starting vectors (criteria x n), e.g. the weights of a previous, similar request.
+                    Defaults to the geometric weights.
+    :param tol: Largest change of a weight between two steps at convergence.
+    :param max_iter: Iteration limit.
+    :return: Tuple of eigenvectors normalised to sum 1 (criteria x n), eigenvalues (criteria) and iterations run.
+    """
+    X = np.asarray(X, dtype=float)
+    weights = geometric_weights(X) if initial is None else np.array(initial, dtype=float)
+    weights = weights / np.sum(weights, axis=1, keepdims=True)
+    lamb_max = np.zeros(X.shape[0])
+
+    active = np.arange(X.shape[0])
+    iterations = 0
+    while active.size and iterations < max_iter:
+        iterations += 1
+        product = np.matmul(X[active], weights[active][:, :, np.newaxis])[:, :, 0]
+
+        # The current vector sums to 1, so the sum of X·w estimates the eigenvalue
+        lamb_max[active] = np.sum(product, axis=1)
+        updated = product / lamb_max[active][:, np.newaxis]
+
+        change = np.max(np.abs(updated - weights[active]), axis=1)
+        weights[active] = updated
+        active = active[change > tol]
+
+    return weights, lamb_max, iterations
+
+
+def derive_ahp_weights(tensor, weight_derivation='geometric', initial=None, tol=POWER_ITERATION_TOLERANCE,
+                       max_iter=POWER_ITERATION_MAX_ITER):
+    """
+    Derive AHP weights and consistency ratios for a stack of pairwise matrices at once.
+
+    The consistency ratio follows pyDecision's ahp_method: CI = (lambda_max - n) / (n - 1) over its random index,
+    with lambda_max from the derived weights (mean of X·w / w) or, for max_eigen, from the power iteration.
+
+    :param tensor: Pairwise matrices (criteria x n x n).
+    :param weight_derivation: 'mean', 'geometric' or 'max_eigen' (same names as pyDecision's ahp_method).
+    :param initial: Warm start of the max_eigen power iteration (criteria x n).
+    :param tol: Convergence tolerance of the power iteration.
+    :param max_iter: Iteration limit of the power iteration.
+    :return: Tuple of weights (criteria x n) and consistency ratios (criteria).
+    """
+    X = np.asarray(tensor, dtype=float)
+    n = X.shape[-1]
+    method = WEIGHT_DERIVATIONS.get(weight_derivation)
+
+    if method == 'mean':
+        weights = np.mean(X / np.sum(X, axis=1, keepdims=True), axis=2)
+        lamb_max = np.mean(np.matmul(X, weights[:, :, np.newaxis])[:, :, 0] / weights, axis=1)
+    elif method == 'geometric':
+        weights = geometric_weights(X)
+        lamb_max = np.mean(np.matmul(X, weights[:, :, np.newaxis])[:, :, 0] / weights, axis=1)
+    elif method == 'max_eigen':
+        weights, lamb_max, _ = power_iteration(X, initial, tol, max_iter)
+    else:
+        raise ValueError("Invalid weight_derivation. Use 'mean', 'geometric' or 'max_eigen'.")
+
+    return weights, consistency_ratios(lamb_max, n)
+
+
+def consistency_ratios(lamb_max, n):
+    """
+    Consistency ratios from the principal eigenvalues, as pyDecision's ahp_method computes them.
+
+    :param lamb_max: Principal eigenvalue of each matrix.
+    :param n: Matrix size.
+    :return: Consistency ratio of each matrix.
+    """
+    lamb_max = np.asarray(lamb_max, dtype=float)
+
+    # Matrices of size 1 or 2 are always consistent; sizes past the table reuse its last entry
+    if n < 3:
+        return np.zeros(lamb_max.shape)
+    consistency_index = (lamb_max - n) / (n - 1)
+    return consistency_index / RANDOM_INDEX[min(n, len(RANDOM_INDEX) - 1)]
+
+
+def ahp_weights(pairwise_matrix, weight_derivation='geometric'):
+    """
+    Weights and consistency ratio of one pairwise matrix, a drop-in for pyDecision's ahp_method.
+
+    :param pairwise_matrix: Square pairwise comparison matrix (e.g. of the criteria).
+    :param weight_derivation: 'mean', 'geometric' or 'max_eigen'.
+    :return: Tuple of weights (n) and consistency ratio.
+    :raises ValueError: For a matrix that is not square or not positive, or an unknown weight_derivation.
+    """
+    X = np.asarray(pairwise_matrix, dtype=float)
+    if X.ndim != 2 or X.shape[0] != X.shape[1]:
+        raise ValueError('The pairwise matrix must be square')
+    if not np.all(X > 0):
+        raise ValueError('The pairwise matrix must only contain positive values')
+
+    weights, consistency_ratios = derive_ahp_weights(X[np.newaxis], weight_derivation)
+    return weights[0], float(consistency_ratios[0])
+
+
+# Below this many companies the dense (criteria x n x n) tensor is faster than the implicit matrices
+# (python -m benchmarks.implicit_ahp: the implicit path wins from about 100 companies, max_eigen from 150)
+IMPLICIT_AHP_MIN_COMPANIES = 150
+
+# Relative margin around the band edges of ImplicitPairwiseMatrix, far above the rounding of the ratio test
+BAND_EDGE_MARGIN = 1e-9
+
+
+class ImplicitPairwiseMatrix:
+    """
+    Pairwise matrix of one criterion, as built by calculate_pairwise_tensor, without its n x n entries.
+
+    An entry only depends on the band of the ratio |a - b| / max(a, b) of two magnitudes and on which of the two
+    is preferred. With the magnitudes sorted, the companies in each band of a company form one range of smaller
+    and one range of larger magnitudes; the range edges are searched near the rounded thresholds and settled with
+    the same ratio test as calculate_pairwise_tensor, so entries are identical. Building is O(n log n) and every product with the
+    matrix O(n), via prefix sums over the ranges.
+    """
+
+    def __init__(self, values, criterion_type):
+        """
+        :param values: Value of each company for the criterion.
+        :param criterion_type: 'max' for benefit, 'min' for cost.
+        """
+        if criterion_type not in ("max", "min"):
+            raise ValueError("Invalid criterion_type. Use 'max' or 'min'.")
+        magnitudes = np.abs(np.asarray(values, dtype=float))
+        self.n = len(magnitudes)
+        self.is_benefit = criterion_type == "max"
+
+        # Comparisons with a zero value are always equal; only nonzero magnitudes are sorted
+        self.nonzero = np.flatnonzero(magnitudes != 0)
+        self.zero = np.flatnonzero(magnitudes == 0)
+        self.order = self.nonzero[np.argsort(magnitudes[self.nonzero], kind='stable')]
+        sorted_magnitudes = magnitudes[self.order]
+        row = magnitudes[self.nonzero]
+        size = len(sorted_magnitudes)
+
+        def ratio(positions):
+            col = sorted_magnitudes[np.minimum(positions, size - 1)]
+            return np.abs(row - col) / np.maximum(row, col)
+
+        lower = np.searchsorted(sorted_magnitudes, row, side='left')
+        upper = np.searchsorted(sorted_magnitudes, row, side='right')
+        self.lower, self.upper = lower, upper
+
+        def bracket(bound, lo, hi):
+            # Positions around a rounded bound that the exact ratio test can fall between
+            return (np.clip(np.searchsorted(sorted_magnitudes, bound * (1 - BAND_EDGE_MARGIN), side='left'), lo, hi),
+                    np.clip(np.searchsorted(sorted_magnitudes, bound * (1 + BAND_EDGE_MARGIN), side='right'), lo, hi))
+
+        # Smaller magnitudes: the ratio falls towards the company, so each band starts where ratio <= threshold,
+        # around magnitude * (1 - threshold). Edges of the ranges with intensity 9, 7, 5, 3 and 1.
+        zeros = np.zeros_like(lower)
+        starts = [_first_true(*bracket(row * (1 - threshold), zeros, lower),
+                              lambda positions: ratio(positions) <= threshold)
+                  for threshold in INTENSITY_THRESHOLDS[::-1]]
+        self.smaller_edges = np.array([zeros, *starts, lower])
+
+        # Larger magnitudes: the ratio grows away from the company and passes the threshold around
+        # magnitude / (1 - threshold). Edges of the ranges with intensity 1 to 9.
+        ends = [_first_true(*bracket(row / (1 - threshold), upper, size),
+                            lambda positions: ratio(positions) > threshold)
+                for threshold in INTENSITY_THRESHOLDS]
+        self.larger_edges = np.array([upper, *ends, np.full_like(upper, size)])
+
+    def apply(self, v, preferred_values, dominated_values, neutral_value):
+        """
+        Product of a vector with the matrix whose entries are mapped per band.
+
+        :param v: Vector (n).
+        :param preferred_values: Entry of a preferred company per intensity (1, 3, 5, 7, 9).
+        :param dominated_values: Entry of a dominated company per intensity.
+        :param neutral_value: Entry of equal magnitudes and comparisons with zero values.
+        :return: Vector (n).
+        """
+        v = np.asarray(v, dtype=float)
+        prefix = np.concatenate(([0.0], np.cumsum(v[self.order])))
+        zero_sum = np.sum(v[self.zero])
+
+        smaller_sums = prefix[self.smaller_edges[1:]] - prefix[self.smaller_edges[:-1]]  # Intensity 9 to 1
+        larger_sums = prefix[self.larger_edges[1:]] - prefix[self.larger_edges[:-1]]  # Intensity 1 to 9
+        equal_sums = prefix[self.upper] - prefix[self.lower]
+
+        # Benefit criteria prefer the larger magnitude, cost criteria the smaller one
+        smaller_values, larger_values = (preferred_values, dominated_values) if self.is_benefit \
+            else (dominated_values, preferred_values)
+        result = np.full(self.n, neutral_value * np.sum(v))
+        result[self.nonzero] = np.asarray(smaller_values, dtype=float)[::-1] @ smaller_sums \
+            + np.asarray(larger_values, dtype=float) @ larger_sums + neutral_value * (equal_sums + zero_sum)
+        return result
+
+    def matvec(self, v):
+        """
+        :param v: Vector (n).
+        :return: Product of the pairwise matrix with v.
+        """
+        return self.apply(v, INTENSITY_VALUES, 1 / INTENSITY_VALUES, 1.0)
+
+    def column_sums(self):
+        """
+        :return: Sum of each column of the pairwise matrix (entry (i, j) is the reciprocal of entry (j, i)).
+        """
+        return self.apply(np.ones(self.n), 1 / INTENSITY_VALUES, INTENSITY_VALUES, 1.0)
+
+    def log_row_sums(self):
+        """
+        :return: Sum of the logarithms of each row of the pairwise matrix.
+        """
+        return self.apply(np.ones(self.n), np.log(INTENSITY_VALUES), -np.log(INTENSITY_VALUES), 0.0)
+
+
+def _first_true(lo, hi, predicate):
+    # Vectorized binary search: first position in [lo, hi) where a monotone (False, then True) predicate holds,
+    # hi if none
+    lo, hi = lo.copy(), hi.copy()
+    while True:
+        active = lo < hi
+        if not active.any():
+            return lo
+        mid = (lo + hi) // 2
+        holds = predicate(mid)
+        hi = np.where(active & holds, mid, hi)
+        lo = np.where(active & ~holds, mid + 1, lo)
+
+
+def derive_implicit_ahp_weights(decision_matrix, criterion_types, weight_derivation='geometric', initial=None,
+                                tol=POWER_ITERATION_TOLERANCE, max_iter=POWER_ITERATION_MAX_ITER):
+    """
+    Derive the AHP weights of the alternatives from the decision matrix without materialising the pairwise matrices.
+
+    Gives the results of derive_ahp_weights(calculate_pairwise_tensor(...)) up to rounding, in O(n log n) time and
+    O(n) memory per criterion (plus O(n) per power iteration step for max_eigen).
+
+    :param decision_matrix: Decision matrix (companies x criteria).
+    :param criterion_types: Type of each criterion (max for benefit, min for cost).
+    :param weight_derivation: 'mean', 'geometric' or 'max_eigen'.
+    :param initial: Warm start of the max_eigen power iteration (criteria x n).
+    :param tol: Convergence tolerance of the power iteration.
+    :param max_iter: Iteration limit of the power iteration.
+    :return: Tuple of weights (criteria x n) and consistency ratios (criteria).
+    """
+    X = np.asarray(decision_matrix, dtype=float)
+    n, num_criteria = X.shape
+    method = WEIGHT_DERIVATIONS.get(weight_derivation)
+    if method is None:
+        raise ValueError("Invalid weight_derivation. Use 'mean', 'geometric' or 'max_eigen'.")
+
+    weights = np.empty((num_criteria, n))
+    lamb_max = np.empty(num_criteria)
+    for k in range(num_criteria):
+        matrix = ImplicitPairwiseMatrix(X[:, k], criterion_types[k])
+
+        if method == 'mean':
+            w = matrix.matvec(1 / matrix.column_sums()) / n
+        else:
+            w = np.exp(matrix.log_row_sums() / n)
+            w = w / np.sum(w)
+
+        if method == 'max_eigen':
+            if initial is not None:
+                w = np.asarray(initial[k], dtype=float) / np.sum(initial[k])
+            for _ in range(max_iter):
+                product = matrix.matvec(w)
+                lamb_max[k] = np.sum(product)  # w sums to 1
+                updated = product / lamb_max[k]
+                change = np.max(np.abs(updated - w))
+                w = updated
+                if change <= tol:
+                    break
+        else:
+            lamb_max[k] = np.mean(matrix.matvec(w) / w)
+        weights[k] = w
+
+    return weights, consistency_ratios(lamb_max, n)
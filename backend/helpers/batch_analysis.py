@@ -0,0 +1,169 @@
+import numpy as np
+
+from helpers.ahp import IMPLICIT_AHP_MIN_COMPANIES, ahp_weights, derive_ahp_weights, derive_implicit_ahp_weights
+from helpers.mcda_helpers import calculate_pairwise_tensor, min_max_normalisation
+from helpers.mcda_methods import topsis_scores, waspas_normalisation, wsm_scores, wpm_scores, \
+    promethee_ii_criterion_flows
+
+
+BATCH_METHODS = ('ahp', 'topsis', 'wsm', 'wpm', 'waspas', 'promethee')
+
+# Same defaults as the single-method routes
+PROMETHEE_DEFAULTS = {"Q": 0.2, "S": 0.4, "P": 0.5, "W": 1.00, "F": 't5'}
+
+
+def scenario_vector(scenario, key, size, default):
+    """
+    Read a per-criterion parameter of a scenario.
+
+    :param scenario: Scenario dictionary from the request.
+    :param key: Parameter name (e.g. 'weights').
+    :param size: Number of criteria.
+    :param default: Value used for every criterion when the parameter is missing (also sets the value type).
+    :return: List with one value per criterion.
+    """
+    values = scenario.get(key) or [default] * size
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError(f"'{key}' must have one value per criterion ({size}).")
+    return [type(default)(value) for value in values]
+
+
+def scenario_result(method, scores, company_ids, **extra):
+    """
+    Build the result of one scenario.
+
+    :param method: Analysis method.
+    :param scores: Score of each company, in company order.
+    :param company_ids: Company IDs, in company order.
+    :return: Dictionary with scores and the ranking (company IDs, best first).
+    """
+    ranking = np.argsort(-scores, kind='stable')
+    return {"method": method, "scores": scores.tolist(), "ranking": [company_ids[i] for i in ranking], **extra}
+
+
+def evaluate_scenarios(decision_matrix, criteria, company_ids, scenarios):
+    """
+    Evaluate many analysis scenarios on one decision matrix.
+
+    Scenarios are grouped by method; each group is evaluated with stacked matrix operations, e.g. a
+    (scenarios x criteria) weight matrix times the normalised matrix for WSM/WPM/WASPAS/TOPSIS.
+    An invalid scenario gets an error entry and does not fail the others.
+
+    :param decision_matrix: Decision matrix (companies x criteria).
+    :param criteria: List of criteria metadata from list_criteria().
+    :param company_ids: Company IDs, in decision matrix row order.
+    :param scenarios: List of scenario dictionaries with 'method' and its parameters.
+    :return: List of results, in scenario order.
+    """
+    m = decision_matrix.shape[1]
+    criterion_types = [c["type"] for c in criteria]
+    results = [None] * len(scenarios)
+
+    # Parse and validate the parameters of every scenario, grouped by method
+    groups = {method: [] for method in BATCH_METHODS}
+    for index, scenario in enumerate(scenarios):
+        method = scenario.get('method') if isinstance(scenario, dict) else None
+        if method not in BATCH_METHODS:
+            results[index] = {"method": method, "error": f"Invalid method. Use one of {', '.join(BATCH_METHODS)}."}
+            continue
+
+        try:
+            if method == 'promethee':
+                params = {key: scenario_vector(scenario, key, m, default) for key, default in PROMETHEE_DEFAULTS.items()}
+                params["block_size"] = int(scenario.get("block_size", 256))
+                if not np.all(np.isfinite(params["W"])) or sum(params["W"]) <= 0:
+                    raise ValueError("W must be finite with a positive sum.")
+            elif method == 'ahp':
+                pairwise_matrix = scenario.get('pairwise_matrix', [])
+                if not pairwise_matrix or len(pairwise_matrix) != m:
+                    raise ValueError('Invalid pairwise matrix provided.')
+                params = {"pairwise_matrix": pairwise_matrix,
+                          "weight_derivation": scenario.get('weight_derivation', 'geometric')}
+            else:
+                params = {"weights": scenario_vector(scenario, 'weights', m, 1 / m),
+                          "lambda_value": float(scenario.get('lambda_value', 0.5))}
+        except (ValueError, TypeError) as e:
+            results[index] = {"method": method, "error": str(e)}
+            continue
+
+        groups[method].append((index, params))
+
+    # WSM, WPM and WASPAS share one normalised matrix and one stacked weight matrix
+    additive = groups['wsm'] + groups['wpm'] + groups['waspas']
+    if additive:
+        normalized_matrix = waspas_normalisation(decision_matrix, criterion_types)
+        weight_matrix = np.array([params["weights"] for _, params in additive], dtype=float)
+        wsm = wsm_scores(normalized_matrix, weight_matrix)
+        wpm = wpm_scores(normalized_matrix, weight_matrix)
+
+        for row, (index, params) in enumerate(additive):
+            method = scenarios[index]['method']
+            if method == 'wsm':
+                results[index] = scenario_result(method, wsm[row], company_ids)
+            elif method == 'wpm':
+                results[index] = scenario_result(method, wpm[row], company_ids)
+            else:
+                lambda_value = params["lambda_value"]
+                waspas = lambda_value * wsm[row] + (1 - lambda_value) * wpm[row]
+                results[index] = scenario_result(method, waspas, company_ids, wsm=wsm[row].tolist(), wpm=wpm[row].tolist())
+
+    if groups['topsis']:
+        weight_matrix = np.array([params["weights"] for _, params in groups['topsis']], dtype=float)
+        closeness = topsis_scores(decision_matrix, weight_matrix, criterion_types)
+        for row, (index, _) in enumerate(groups['topsis']):
+            results[index] = scenario_result('topsis', closeness[row], company_ids)
+
+    if groups['promethee']:
+        # Net flows are linear in W: compute the pairwise preferences once per (Q, S, P, F) combination
+        # and apply all weight vectors of that combination as one matrix product
+        normalized_matrix = min_max_normalisation(decision_matrix, criterion_types)
+        n = decision_matrix.shape[0]
+        combinations = {}
+        for index, params in groups['promethee']:
+            key = (tuple(params["Q"]), tuple(params["S"]), tuple(params["P"]), tuple(params["F"]), params["block_size"])
+            combinations.setdefault(key, []).append((index, params["W"]))
+
+        for key, entries in combinations.items():
+            try:
+                criterion_flows = promethee_ii_criterion_flows(normalized_matrix, *key)
+            except (ValueError, TypeError) as e:
+                for index, _ in entries:
+                    results[index] = {"method": 'promethee', "error": f'Invalid PROMETHEE parameters: {str(e)}'}
+                continue
+
+            weight_matrix = np.array([W for _, W in entries], dtype=float)
+            flows = weight_matrix @ criterion_flows.T / np.sum(weight_matrix, axis=1, keepdims=True) / (n - 1)
+            for row, (index, _) in enumerate(entries):
+                results[index] = scenario_result('promethee', flows[row], company_ids)
+
+    if groups['ahp']:
+        # Criteria weights come from each scenario's pairwise matrix; alternative weights only depend on
+        # the weight derivation, so scenarios sharing it are scored with one (scenarios x criteria) product
+        valid = {}
+        for index, params in groups['ahp']:
+            try:
+                criteria_weights, rc = ahp_weights(params["pairwise_matrix"], params["weight_derivation"])
+            except Exception as e:
+                results[index] = {"method": 'ahp', "error": f'Error calculating criteria weights: {str(e)}'}
+                continue
+            if rc > 0.1:  # Consistency check
+                results[index] = {"method": 'ahp', "error": 'Inconsistent criteria comparison. Please review your pairwise comparisons for criteria.'}
+                continue
+            valid.setdefault(params["weight_derivation"], []).append((index, criteria_weights, rc))
+
+        # No comparison texts in batch results: larger sets get the weights from the implicit pairwise matrices
+        implicit = len(decision_matrix) >= IMPLICIT_AHP_MIN_COMPANIES
+        if valid and not implicit:
+            pairwise_tensor = calculate_pairwise_tensor(decision_matrix, criterion_types)
+        for weight_derivation, entries in valid.items():
+            if implicit:
+                alternative_weights, _ = derive_implicit_ahp_weights(decision_matrix, criterion_types,
+                                                                     weight_derivation)
+            else:
+                alternative_weights, _ = derive_ahp_weights(pairwise_tensor, weight_derivation)
+            scores = np.array([criteria_weights for _, criteria_weights, _ in entries]) @ alternative_weights
+            for row, (index, criteria_weights, rc) in enumerate(entries):
+                results[index] = scenario_result('ahp', scores[row], company_ids,
+                                                 criteria_weights=criteria_weights.tolist(), consistency_ratio=float(rc))
+
+    return results
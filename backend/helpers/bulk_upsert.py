@@ -0,0 +1,92 @@
+from app import db
+from app.models import Company, FinancialIndicator
+
+
+def format_counts(counts):
+    """
+    Format upsert counts for the ingestion script output.
+
+    :param counts: Dictionary from upsert_financial_indicators or insert_companies.
+    :return: String like '3 inserted, 12 updated, 5 skipped'.
+    """
+    return ', '.join(f"{counts[key]} {key}" for key in ("inserted", "updated", "skipped"))
+
+
+def preload_indicators(columns):
+    """
+    Load the existing financial indicator rows in one query.
+
+    :param columns: Indicator column names to load.
+    :return: Dictionary of company ID to a dictionary with the row id and the columns (first row per company).
+    """
+    query = db.session.query(FinancialIndicator.id, FinancialIndicator.company_id,
+                             *[getattr(FinancialIndicator, column) for column in columns])
+    existing = {}
+    for row in query.order_by(FinancialIndicator.id):
+        existing.setdefault(row.company_id, dict(zip(['id', *columns], [row.id, *row[2:]])))
+    return existing
+
+
+def upsert_financial_indicators(values_by_company):
+    """
+    Insert or update the financial indicators of many companies with bulk statements.
+
+    Existing rows are preloaded once, only changed columns are written and None values keep the stored value.
+    Nothing is committed: call it before bump_data_version() and db.session.commit(), so the whole refresh is a
+    single transaction.
+
+    :param values_by_company: Dictionary of company ID to a dictionary of indicator column values.
+    :return: Dictionary with inserted, updated and skipped (unknown company or nothing changed) counts.
+    """
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    columns = sorted({column for values in values_by_company.values() for column in values})
+    company_ids = {company_id for company_id, in db.session.query(Company.id)}
+    existing = preload_indicators(columns)
+
+    inserts, updates = [], []
+    for company_id, values in values_by_company.items():
+        values = {column: value for column, value in values.items() if value is not None}
+        if company_id not in company_ids:
+            counts["skipped"] += 1
+            continue
+
+        row = existing.get(company_id)
+        if row is None:
+            inserts.append({"company_id": company_id, **values})
+            counts["inserted"] += 1
+            continue
+
+        changed = {column: value for column, value in values.items() if row[column] != value}
+        if changed:
+            updates.append({"id": row["id"], **changed})
+            counts["updated"] += 1
+        else:
+            counts["skipped"] += 1
+
+    db.session.bulk_insert_mappings(FinancialIndicator, inserts)
+    db.session.bulk_update_mappings(FinancialIndicator, updates)
+    return counts
+
+
+def insert_companies(records):
+    """
+    Insert companies that do not exist yet (matched by name) with one bulk statement.
+
+    :param records: List of company column dictionaries, each with a 'name'.
+    :return: Tuple of a dictionary of name to ID of the inserted companies, and the counts.
+    """
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    existing_names = {name for name, in db.session.query(Company.name)}
+
+    inserts = []
+    for record in records:
+        if record["name"] in existing_names:
+            counts["skipped"] += 1
+            continue
+        existing_names.add(record["name"])
+        inserts.append(dict(record))
+        counts["inserted"] += 1
+
+    # return_defaults fills in the generated IDs, which the indicators need
+    db.session.bulk_insert_mappings(Company, inserts, return_defaults=True)
+    return {record["name"]: record["id"] for record in inserts}, counts
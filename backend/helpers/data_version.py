@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from app import db
+from app.models import DataVersion
+
+
+DATA_VERSION_ID = 1
+
+
+def get_data_version():
+    """
+    Get the current version of the indicator data.
+
+    :return: Version number (0 if the data was never stamped).
+    """
+    version = db.session.query(DataVersion.version).filter_by(id=DATA_VERSION_ID).scalar()
+    return version or 0
+
+
+def bump_data_version():
+    """
+    Mark the indicator data as changed.
+
+    Call it from the ingestion scripts before db.session.commit(), so the new version is committed
+    together with the data it describes.
+
+    :return: None
+    """
+    # Increment in SQL so concurrent ingestion runs cannot lose an update
+    updated = DataVersion.query.filter_by(id=DATA_VERSION_ID).update({
+        DataVersion.version: DataVersion.version + 1,
+        DataVersion.updated_at: datetime.utcnow()
+    })
+    if not updated:
+        db.session.add(DataVersion(id=DATA_VERSION_ID, version=1, updated_at=datetime.utcnow()))
@@ -0,0 +1,138 @@
+import sys
+import weakref
+from datetime import datetime
+
+from sqlalchemy import event, text
+
+from app import db
+
+
+# Schema changes for databases created before the models declared them; create_all() does not alter existing
+# tables. Every statement is idempotent, so workers starting at the same time can apply them concurrently.
+# Migrations never delete data: see dedupe_financial_indicators() for databases with duplicate indicator rows.
+MIGRATIONS = [
+    (1, 'Indexes on financial_indicators.company_id (unique), companies.symbol and companies.name', [
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_financial_indicators_company_id ON financial_indicators (company_id)',
+        'CREATE INDEX IF NOT EXISTS ix_companies_symbol ON companies (symbol)',
+        'CREATE INDEX IF NOT EXISTS ix_companies_name ON companies (name)',
+    ]),
+]
+
+_configured_engines = weakref.WeakSet()
+
+
+def sqlite_pragmas(config):
+    """
+    PRAGMA statements for new SQLite connections.
+
+    :param config: App config (or dictionary) with the SQLITE_* settings.
+    :return: List of PRAGMA statements.
+    """
+    return [
+        f"PRAGMA journal_mode={config.get('SQLITE_JOURNAL_MODE', 'WAL')}",
+        f"PRAGMA synchronous={config.get('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+        f"PRAGMA mmap_size={int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+        f"PRAGMA cache_size={int(config.get('SQLITE_CACHE_SIZE', -64 * 1024))}",
+        f"PRAGMA busy_timeout={int(config.get('SQLITE_BUSY_TIMEOUT', 5000))}",
+    ]
+
+
+def register_sqlite_pragmas(engine, pragmas):
+    """
+    Run PRAGMA statements on every new connection of an engine (once per engine, SQLite only).
+
+    :param engine: SQLAlchemy engine.
+    :param pragmas: PRAGMA statements from sqlite_pragmas().
+    :return: None
+    """
+    if engine.dialect.name != 'sqlite' or engine in _configured_engines:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    _configured_engines.add(engine)
+
+
+def count_duplicate_indicators():
+    """
+    Count the financial indicator rows that are not the first row of their company.
+
+    :return: Number of duplicate rows.
+    """
+    return db.session.execute(text(
+        'SELECT COUNT(*) - COUNT(DISTINCT company_id) FROM financial_indicators'
+    )).scalar() or 0
+
+
+def dedupe_financial_indicators():
+    """
+    Delete the duplicate financial indicator rows of each company, keeping its first row (the one readers used),
+    so migration 1 can add the unique index on company_id.
+
+    :return: Number of deleted rows.
+    """
+    deleted = db.session.execute(text(
+        'DELETE FROM financial_indicators WHERE id NOT IN '
+        '(SELECT MIN(id) FROM financial_indicators GROUP BY company_id)'
+    )).rowcount
+    db.session.commit()
+    return deleted
+
+
+def apply_migrations():
+    """
+    Apply the migrations that are not recorded in the schema_migrations table yet.
+
+    Migration 1 is postponed while companies have duplicate indicator rows: the unique index cannot be created
+    and the duplicates are only deleted on request (python -m helpers.database dedupe). Later migrations wait
+    for it, so they are always applied in order.
+
+    :return: List of applied migration versions.
+    """
+    db.session.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, description TEXT, applied_at TIMESTAMP)'
+    ))
+    applied = {version for version, in db.session.execute(text('SELECT version FROM schema_migrations'))}
+
+    applied_now = []
+    for version, description, statements in MIGRATIONS:
+        if version in applied:
+            continue
+
+        if version == 1:
+            duplicates = count_duplicate_indicators()
+            if duplicates:
+                print(f"Migration 1 postponed: {duplicates} duplicate financial indicator rows. "
+                      f"Run 'python -m helpers.database dedupe' to keep the first row of each company.")
+                break
+
+        for statement in statements:
+            db.session.execute(text(statement))
+        db.session.execute(
+            text('INSERT OR IGNORE INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)'),
+            {"v": version, "d": description, "t": datetime.utcnow()}
+        )
+        db.session.commit()
+        applied_now.append(version)
+
+    db.session.commit()
+    return applied_now
+
+
+# Delete duplicate indicator rows and apply the postponed migrations: python -m helpers.database dedupe
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+
+    with app.app_context():
+        if sys.argv[1:] == ['dedupe']:
+            print(f"Deleted {dedupe_financial_indicators()} duplicate financial indicator rows")
+            print(f"Applied migrations: {apply_migrations() or 'none'}")
+        else:
+            print(f"{count_duplicate_indicators()} duplicate financial indicator rows")
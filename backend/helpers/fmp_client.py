@@ -0,0 +1,122 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+from helpers.http_client import TokenBucket, create_session, get_json
+from helpers.response_cache import get_response_cache
+
+load_dotenv()
+
+# API key for Financial Modeling Prep
+API_KEY = os.getenv('FMP_API_KEY')
+
+# Base URL of the API (point it at a local stub server for testing)
+BASE_URL = os.getenv('FMP_BASE_URL', 'https://financialmodelingprep.com/api/v3')
+
+# Request quota of the FMP plan and number of concurrent requests
+REQUESTS_PER_MINUTE = float(os.getenv('FMP_REQUESTS_PER_MINUTE', 300))
+MAX_WORKERS = int(os.getenv('FMP_MAX_WORKERS', 8))
+MAX_RETRIES = int(os.getenv('FMP_MAX_RETRIES', 3))
+
+# Symbols per request on endpoints that accept comma-separated lists (profile, quote)
+BATCH_SIZE = int(os.getenv('FMP_BATCH_SIZE', 50))
+
+# Keep-alive session and rate limiter shared by all fetcher threads
+session = create_session(MAX_WORKERS)
+rate_limiter = TokenBucket(REQUESTS_PER_MINUTE / 60, capacity=MAX_WORKERS)
+
+
+def fmp_get(endpoint, params=None):
+    """
+    GET an FMP endpoint (rate limited, retried with jittered backoff, served from the response cache when fresh).
+
+    :param endpoint: Path below BASE_URL, e.g. 'profile/AAPL'.
+    :param params: Additional query parameters.
+    :return: Parsed JSON.
+    :raises requests.exceptions.RequestException: When all attempts fail.
+    """
+    return get_json(session, f'{BASE_URL}/{endpoint}', params={**(params or {}), 'apikey': API_KEY},
+                    limiter=rate_limiter, retries=MAX_RETRIES, cache=get_response_cache(),
+                    endpoint=endpoint.split('/')[0])
+
+
+def fetch_symbol_batch(endpoint, symbols):
+    """
+    Request one comma-separated batch of symbols.
+
+    :param endpoint: Endpoint accepting symbol lists ('profile' or 'quote').
+    :param symbols: Symbols of the batch.
+    :return: Dictionary of symbol to entry; symbols missing from the response are left out.
+    """
+    try:
+        data = fmp_get(f"{endpoint}/{','.join(symbols)}")
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching {endpoint} batch {symbols[0]}..{symbols[-1]}: {e}")
+        return {}
+
+    if not isinstance(data, list):
+        return {}
+    return {entry.get('symbol'): entry for entry in data if isinstance(entry, dict)}
+
+
+def fetch_single_symbol(endpoint, symbol):
+    """
+    Request one symbol (fallback for symbols a batch did not return).
+
+    :param endpoint: Endpoint, e.g. 'profile'.
+    :param symbol: Symbol.
+    :return: First entry of the response or None.
+    """
+    try:
+        data = fmp_get(f'{endpoint}/{symbol}')
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching {endpoint} for symbol {symbol}: {e}")
+        return None
+
+    if not data or not isinstance(data, list):  # Handle empty response
+        return None
+    return data[0]
+
+
+def fetch_symbols_batched(endpoint, symbols, batch_size=None, executor=None):
+    """
+    Fetch an endpoint for many symbols with one request per batch.
+
+    Batches are requested concurrently; the responses are demultiplexed by symbol, and symbols that are missing
+    from their batch response (failed batch, unknown or renamed symbol) are requested one at a time.
+
+    :param endpoint: Endpoint accepting comma-separated symbol lists ('profile' or 'quote').
+    :param symbols: Symbols to fetch.
+    :param batch_size: Symbols per request (FMP_BATCH_SIZE by default).
+    :param executor: Thread pool to use; a temporary one is created when omitted.
+    :return: Dictionary of symbol to entry, None for symbols without data.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    unique_symbols = list(dict.fromkeys(symbol for symbol in symbols if symbol))
+    batches = [unique_symbols[start:start + batch_size] for start in range(0, len(unique_symbols), batch_size)]
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+    try:
+        results = {}
+        missing = []
+        for batch, entries in zip(batches, executor.map(lambda batch: fetch_symbol_batch(endpoint, batch), batches)):
+            for symbol in batch:
+                if symbol in entries:
+                    results[symbol] = entries[symbol]
+                elif len(batch) > 1:
+                    missing.append(symbol)
+                else:
+                    results[symbol] = None
+
+        for symbol, entry in zip(missing, executor.map(lambda symbol: fetch_single_symbol(endpoint, symbol), missing)):
+            results[symbol] = entry
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    return results
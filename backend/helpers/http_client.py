@@ -0,0 +1,127 @@
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# Responses worth retrying: rate limited or a temporary server error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class OfflineCacheMiss(requests.exceptions.RequestException):
+    """
+    Raised in offline mode for a request that is not in the response cache.
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    Tokens refill at `rate` per second up to `capacity`; acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def create_session(pool_size=10):
+    """
+    Create a keep-alive HTTP session shared by the fetcher threads.
+
+    :param pool_size: Number of pooled connections per host (at least the number of threads).
+    :return: requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def backoff_delay(attempt, backoff, response=None):
+    """
+    Delay before a retry: the server's Retry-After if given, otherwise exponential backoff with full jitter.
+
+    :param attempt: Zero-based number of the failed attempt.
+    :param backoff: Base delay in seconds.
+    :param response: Failed response, if any.
+    :return: Delay in seconds.
+    """
+    if response is not None:
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, backoff * 2 ** attempt)
+
+
+def get_json(session, url, params=None, limiter=None, retries=3, backoff=1.0, timeout=30, cache=None, endpoint=None,
+             cacheable=None):
+    """
+    GET a JSON document, pacing requests with a rate limiter and retrying temporary failures.
+
+    With a response cache, fresh cached responses are returned without a request (and without taking a token).
+
+    :param session: Session from create_session.
+    :param url: Request URL.
+    :param params: Query parameters.
+    :param limiter: Optional TokenBucket; every attempt takes a token.
+    :param retries: Number of retries after the first attempt.
+    :param backoff: Base delay of the jittered exponential backoff in seconds.
+    :param timeout: Request timeout in seconds.
+    :param cache: Optional ResponseCache.
+    :param endpoint: Endpoint name used for the cache TTL (e.g. 'profile').
+    :param cacheable: Optional check of the parsed JSON; responses failing it (e.g. quota messages) are not cached.
+    :return: Parsed JSON.
+    :raises requests.exceptions.RequestException: When all attempts fail, or OfflineCacheMiss in offline mode.
+    """
+    if cache is not None:
+        body = cache.get(url, params, endpoint)
+        if body is not None:
+            return json.loads(body)
+        if cache.offline:
+            raise OfflineCacheMiss(f"No cached response for {url} ({endpoint}) in offline mode")
+
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == retries:
+                raise
+            time.sleep(backoff_delay(attempt, backoff))
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            time.sleep(backoff_delay(attempt, backoff, response))
+            continue
+
+        response.raise_for_status()  # Raise HTTPError for bad HTTP responses
+        data = response.json()
+        if cache is not None and (cacheable is None or cacheable(data)):
+            cache.set(url, params, endpoint, response.content)
+        return data
@@ -0,0 +1,186 @@
+import sys
+from datetime import datetime, time, timezone
+
+import numpy as np
+from sqlalchemy import func
+
+from app import db
+from app.models import Company, IndicatorHistory
+from helpers.indicator_snapshot import fetch_snapshot_decision_matrix
+from helpers.mcda_helpers import list_criteria, query_company_indicators
+
+
+def history_columns():
+    """
+    Columns recorded in the history: the criteria of the analyses.
+
+    :return: List of IndicatorHistory column names.
+    """
+    return [criterion["id"] for criterion in list_criteria()]
+
+
+def parse_as_of(value):
+    """
+    Parse the as_of parameter of an analyze request.
+
+    :param value: ISO date ('2024-05-31', the end of that day) or date-time; time zones are converted to UTC.
+    :return: Naive UTC datetime.
+    :raises ValueError: For an invalid value.
+    """
+    try:
+        if isinstance(value, str) and len(value) == 10:
+            return datetime.combine(datetime.fromisoformat(value).date(), time.max)
+        as_of = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid as_of '{value}'. Use an ISO date or date-time, e.g. 2024-05-31.")
+
+    if as_of.tzinfo is not None:
+        as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+    return as_of
+
+
+def latest_history_values(columns):
+    """
+    Latest recorded values of every company.
+
+    :param columns: History column names.
+    :return: Dictionary of company ID to a tuple of values.
+    """
+    latest = db.session.query(
+        IndicatorHistory.company_id, func.max(IndicatorHistory.as_of).label('as_of')
+    ).group_by(IndicatorHistory.company_id).subquery()
+
+    rows = db.session.query(
+        IndicatorHistory.company_id, *[getattr(IndicatorHistory, column) for column in columns]
+    ).join(
+        latest, (IndicatorHistory.company_id == latest.c.company_id) & (IndicatorHistory.as_of == latest.c.as_of)
+    )
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def append_indicator_history(as_of=None):
+    """
+    Append the current criteria values of every company whose values changed since its latest history row.
+
+    Call it before db.session.commit() in the ingestion scripts, so the history is committed with the data.
+
+    :param as_of: Time of the snapshot (UTC, now by default).
+    :return: Number of appended rows.
+    """
+    as_of = as_of or datetime.utcnow()
+    columns = history_columns()
+    latest = latest_history_values(columns)
+
+    appended = []
+    for row in query_company_indicators(None, columns):
+        values = tuple(None if value is None else float(value) for value in row[3:])
+        if latest.get(row[0]) != values:
+            appended.append({"company_id": row[0], "as_of": as_of, **dict(zip(columns, values))})
+
+    db.session.bulk_insert_mappings(IndicatorHistory, appended)
+    return len(appended)
+
+
+def fetch_history_decision_matrix(selected_company_ids, criteria, as_of):
+    """
+    Fetch the decision matrix of selected companies as it was at a point in time.
+
+    Each company's row is found with one seek on the (company_id, as_of) index, i.e. O(log n) per company.
+
+    :param selected_company_ids: List of company IDs to fetch data for.
+    :param criteria: List of criteria metadata from list_criteria().
+    :param as_of: Naive UTC datetime.
+    :return: Tuple of company index (list of id/name/symbol dictionaries) and decision matrix (companies x criteria).
+             Companies without history before as_of are left out.
+    """
+    latest_id = db.session.query(IndicatorHistory.id).filter(
+        IndicatorHistory.company_id == Company.id, IndicatorHistory.as_of <= as_of
+    ).order_by(IndicatorHistory.as_of.desc()).limit(1).correlate(Company).scalar_subquery()
+
+    rows = db.session.query(
+        Company.id, Company.name, Company.symbol, *[getattr(IndicatorHistory, c["id"]) for c in criteria]
+    ).join(
+        IndicatorHistory, IndicatorHistory.id == latest_id
+    ).filter(Company.id.in_(selected_company_ids)).all()
+
+    # Restore the requested order (IN does not preserve it)
+    rows_by_id = {row[0]: row for row in rows}
+    rows = [rows_by_id[company_id] for company_id in dict.fromkeys(selected_company_ids) if company_id in rows_by_id]
+
+    companies = [{"id": row[0], "name": row[1], "symbol": row[2]} for row in rows]
+    decision_matrix = np.array([row[3:] for row in rows], dtype=float).reshape(len(rows), len(criteria))
+    return companies, decision_matrix
+
+
+def fetch_decision_matrix_as_of(selected_company_ids, criteria, as_of=None):
+    """
+    Fetch the decision matrix for an analyze request: current values, or historical ones when as_of is given.
+
+    :param selected_company_ids: List of company IDs to fetch data for.
+    :param criteria: List of criteria metadata from list_criteria().
+    :param as_of: Optional as_of parameter of the request.
+    :return: Tuple of company index and decision matrix (companies x criteria).
+    :raises ValueError: For an invalid as_of.
+    """
+    if as_of is None:
+        return fetch_snapshot_decision_matrix(selected_company_ids, criteria)
+    return fetch_history_decision_matrix(selected_company_ids, criteria, parse_as_of(as_of))
+
+
+def company_history(company_id):
+    """
+    All recorded values of one company, oldest first.
+
+    :param company_id: Company ID.
+    :return: List of dictionaries with as_of and the criteria values.
+    """
+    columns = history_columns()
+    rows = db.session.query(
+        IndicatorHistory.as_of, *[getattr(IndicatorHistory, column) for column in columns]
+    ).filter(IndicatorHistory.company_id == company_id).order_by(IndicatorHistory.as_of)
+    return [{"as_of": row[0].isoformat(), **dict(zip(columns, row[1:]))} for row in rows]
+
+
+def compact_indicator_history(batch_size=500):
+    """
+    Delete history rows whose values equal the previous row of the same company.
+
+    Point-in-time lookups return the same values afterwards, because the earlier row of each run of equal
+    values is kept. Commits the deletion.
+
+    :param batch_size: Row IDs deleted per statement.
+    :return: Number of deleted rows.
+    """
+    columns = history_columns()
+    rows = db.session.query(
+        IndicatorHistory.id, IndicatorHistory.company_id, *[getattr(IndicatorHistory, column) for column in columns]
+    ).order_by(IndicatorHistory.company_id, IndicatorHistory.as_of)
+
+    duplicates = []
+    previous = None
+    for row in rows:
+        current = (row[1], tuple(row[2:]))
+        if current == previous:
+            duplicates.append(row[0])
+        previous = current
+
+    for start in range(0, len(duplicates), batch_size):
+        IndicatorHistory.query.filter(IndicatorHistory.id.in_(duplicates[start:start + batch_size])) \
+            .delete(synchronize_session=False)
+    db.session.commit()
+    return len(duplicates)
+
+
+# Record the current values or compact the history: python -m helpers.indicator_history [append|compact]
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+
+    with app.app_context():
+        if sys.argv[1:] == ['compact']:
+            print(f"Deleted {compact_indicator_history()} unchanged history rows")
+        else:
+            appended = append_indicator_history()
+            db.session.commit()
+            print(f"Appended {appended} history rows")
@@ -0,0 +1,133 @@
+import threading
+
+import numpy as np
+
+from helpers.data_version import get_data_version
+from helpers.mcda_helpers import list_criteria
+from helpers.shared_matrix import shared_matrix_dir, read_indicator_columns, load_shared_matrix, export_shared_matrix
+
+
+class IndicatorSnapshot:
+    """
+    Read-only columnar copy of the financial_indicators table.
+
+    Holds one contiguous float array per criterion from list_criteria() and an id -> row index,
+    so the analyze routes can build decision matrices with fancy indexing instead of querying SQLite.
+    """
+
+    def __init__(self, version, index, values):
+        """
+        :param version: Data version the snapshot was built from.
+        :param index: Dictionary with criteria, company_ids, names, symbols and ranks lists.
+        :param values: Indicator values (criteria x companies), e.g. memory-mapped from the shared matrix file.
+        """
+        self.version = version
+        self.company_ids = np.array(index["company_ids"], dtype=np.int64)
+        self.names = index["names"]
+        self.symbols = index["symbols"]
+        self.ranks = np.array([np.nan if rank is None else rank for rank in index["ranks"]], dtype=float)
+        self.row_index = {company_id: i for i, company_id in enumerate(index["company_ids"])}
+
+        self.columns = {}
+        for k, criterion_id in enumerate(index["criteria"]):
+            column = values[k]
+            column.flags.writeable = False
+            self.columns[criterion_id] = column
+
+    def rows_for(self, selected_company_ids):
+        """
+        Map company IDs to snapshot rows.
+
+        :param selected_company_ids: List of company IDs.
+        :return: Array of row numbers in the requested order (duplicates and unknown IDs dropped).
+        """
+        return np.array([self.row_index[company_id] for company_id in dict.fromkeys(selected_company_ids)
+                         if company_id in self.row_index], dtype=np.intp)
+
+    def decision_matrix(self, selected_company_ids, criteria):
+        """
+        Slice the decision matrix for selected companies.
+
+        :param selected_company_ids: List of company IDs to fetch data for.
+        :param criteria: List of criteria metadata from list_criteria().
+        :return: Tuple of company index (list of id/name/symbol dictionaries) and decision matrix (companies x criteria).
+        """
+        rows = self.rows_for(selected_company_ids)
+        companies = [
+            {"id": int(self.company_ids[row]), "name": self.names[row], "symbol": self.symbols[row]}
+            for row in rows.tolist()
+        ]
+
+        decision_matrix = np.empty((len(rows), len(criteria)))
+        for k, criterion in enumerate(criteria):
+            decision_matrix[:, k] = self.columns[criterion["id"]][rows]
+
+        return companies, decision_matrix
+
+    def full_decision_matrix(self, criteria):
+        """
+        Decision matrix of every company in the snapshot, in row order.
+
+        :param criteria: List of criteria metadata from list_criteria().
+        :return: Decision matrix (companies x criteria), NaN for missing indicators.
+        """
+        return np.column_stack([self.columns[criterion["id"]] for criterion in criteria])
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_indicator_snapshot():
+    """
+    Get the process-wide indicator snapshot, rebuilding it when the data version changed.
+
+    :return: Current IndicatorSnapshot.
+    """
+    global _snapshot
+
+    # Read the version before the data, so a concurrent ingestion commit can only cause an extra rebuild
+    version = get_data_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = build_indicator_snapshot(version)
+        return _snapshot
+
+
+def build_indicator_snapshot(version):
+    """
+    Build the indicator snapshot for a data version.
+
+    When Config.SHARED_MATRIX_DIR is set, the values are memory-mapped from the shared matrix file so all
+    gunicorn workers share the same page-cache memory; the first worker to see a new version exports it.
+    The export reads its own version, which is newer than the requested one if an ingestion committed meanwhile.
+
+    :param version: Data version read before the indicator data.
+    :return: IndicatorSnapshot.
+    """
+    criterion_ids = [criterion["id"] for criterion in list_criteria()]
+
+    if shared_matrix_dir():
+        shared = load_shared_matrix(version, criterion_ids)
+        if shared is None:
+            version = export_shared_matrix()
+            shared = load_shared_matrix(version, criterion_ids)
+        if shared is not None:
+            return IndicatorSnapshot(version, *shared)
+
+    return IndicatorSnapshot(version, *read_indicator_columns(criterion_ids))
+
+
+def fetch_snapshot_decision_matrix(selected_company_ids, criteria):
+    """
+    Fetch the decision matrix for selected companies from the indicator snapshot.
+
+    :param selected_company_ids: List of company IDs to fetch data for.
+    :param criteria: List of criteria metadata from list_criteria().
+    :return: Tuple of company index (list of id/name/symbol dictionaries) and decision matrix (companies x criteria).
+    """
+    return get_indicator_snapshot().decision_matrix(selected_company_ids, criteria)
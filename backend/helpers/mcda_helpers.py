@@ -1,6 +1,14 @@
 import numpy as np
 
+from app import db
 from app.models import Company, FinancialIndicator
+from helpers.metrics import timed_stage
+from helpers.ranking import top_k_indices
+
+
+# Upper bounds of the ratio bands used by map_to_intensity and their Saaty intensities
+INTENSITY_THRESHOLDS = np.array([0.10, 0.25, 0.45, 0.75])
+INTENSITY_VALUES = np.array([1.0, 3.0, 5.0, 7.0, 9.0])
 
 
 def calculate_pairwise_matrix(data, criterion_type):
@@ -12,49 +20,48 @@ def calculate_pairwise_matrix(data, criterion_type):
     :return: Comparison matrix for specific criterion and companies.
     """
     # Example revenues for three companies: data = [320430.5, 400000, 350000]
-    n = len(data)
-    matrix = np.ones((n, n))  # Initialize with 1s for diagonal values
-
-    for i in range(n):
-        for j in range(i + 1, n):
-            # Calculate the absolute difference or ratio (ratio is relative so normalisation of values is not needed - ratio between 1000 and 1500 is the same as 1 and 1.5)
-            if data[i] == 0 or data[j] == 0:
-                intensity = 1  # Avoid division by zero; treat as equal
-            else:
-                # Calculate ratio or reverse ratio based on criterion type
-                if criterion_type == "max":  # Benefit criterion
-                    ratio = abs(abs(data[i]) - abs(data[j])) / max(abs(data[i]), abs(data[j]))
-                elif criterion_type == "min":  # Cost criterion
-                    ratio = abs(abs(data[j]) - abs(data[i])) / max(abs(data[i]), abs(data[j]))  # Reverse logic for cost
-                else:
-                    raise ValueError("Invalid criterion_type. Use 'max' or 'min'.")
-
-                # Determine intensity based on the ratio
-                intensity = map_to_intensity(ratio)
-
-            # Populate the pairwise comparison matrix
-            if criterion_type == "max":  # Benefit criterion
-                if abs(data[i]) > abs(data[j]):
-                    matrix[i][j] = intensity
-                    matrix[j][i] = 1 / intensity
-                elif abs(data[i]) < abs(data[j]):
-                    matrix[i][j] = 1 / intensity
-                    matrix[j][i] = intensity
-                else:
-                    matrix[i][j] = 1
-                    matrix[j][i] = 1  # Equal importance for identical values
-            elif criterion_type == "min":  # Cost criterion
-                if abs(data[i]) < abs(data[j]):  # Reverse logic for costs
-                    matrix[i][j] = intensity
-                    matrix[j][i] = 1 / intensity
-                elif abs(data[i]) > abs(data[j]):
-                    matrix[i][j] = 1 / intensity
-                    matrix[j][i] = intensity
-                else:
-                    matrix[i][j] = 1
-                    matrix[j][i] = 1  # Equal importance for identical values
-
-    return matrix
+    decision_matrix = np.asarray(data, dtype=float).reshape(-1, 1)
+    return calculate_pairwise_tensor(decision_matrix, [criterion_type])[0]
+
+
+@timed_stage('matrix')
+def calculate_pairwise_tensor(decision_matrix, criterion_types, dtype=np.float64):
+    """
+    Calculate pairwise comparison matrices for all criteria in one pass.
+
+    :param decision_matrix: Decision matrix (companies x criteria).
+    :param criterion_types: Type of each criterion (max for benefit, min for cost).
+    :param dtype: Float type of the result (float64 or float32).
+    :return: Tensor of pairwise matrices (criteria x companies x companies).
+    """
+    if any(criterion_type not in ("max", "min") for criterion_type in criterion_types):
+        raise ValueError("Invalid criterion_type. Use 'max' or 'min'.")
+
+    # Column-major view: one row of values per criterion
+    values = np.ascontiguousarray(np.asarray(decision_matrix, dtype=float).T)
+    magnitudes = np.abs(values)
+    row = magnitudes[:, :, np.newaxis]
+    col = magnitudes[:, np.newaxis, :]
+
+    # Ratio is relative so normalisation of values is not needed - ratio between 1000 and 1500 is the same as 1 and 1.5
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.abs(row - col) / np.maximum(row, col)
+
+    # Same banding as map_to_intensity (upper bounds inclusive)
+    intensity = INTENSITY_VALUES[np.digitize(ratio, INTENSITY_THRESHOLDS, right=True)]
+
+    # Avoid division by zero; treat as equal
+    is_zero = values == 0
+    intensity[is_zero[:, :, np.newaxis] | is_zero[:, np.newaxis, :]] = 1
+
+    # Benefit criterion prefers the larger value, cost criterion the smaller one
+    is_benefit = np.array([criterion_type == "max" for criterion_type in criterion_types])[:, np.newaxis, np.newaxis]
+    preferred = np.where(is_benefit, row > col, row < col)
+    dominated = np.where(is_benefit, row < col, row > col)
+
+    # Equal importance for identical values (including the diagonal)
+    tensor = np.where(preferred, intensity, np.where(dominated, 1 / intensity, 1.0))
+    return tensor.astype(dtype, copy=False)
 
 
 def map_to_intensity_smooth(ratio):
@@ -85,6 +92,7 @@ def preference_to_text(preferenece_num):
     return mapping.get(preferenece_num, "equally preferred to")
 
 
+@timed_stage('comparisons')
 def generate_comparison_text(matrix, companies):
     """
     Generate textual pairwise comparisons from a pairwise matrix.
@@ -93,16 +101,21 @@ def generate_comparison_text(matrix, companies):
     :param companies: List of company names.
     :return: List of textual comparisons.
     """
-    n = len(matrix)
-    comparisons = []
+    return [comparison for row in iter_comparison_text(matrix, companies) for comparison in row]
 
-    for i in range(n):
-        for j in range(i + 1, n):
-            preference_num = matrix[i][j]
-            text = preference_to_text(preference_num)
-            comparisons.append(f"{companies[i]} is {text} {companies[j]}")
 
-    return comparisons
+def iter_comparison_text(matrix, companies):
+    """
+    Lazily generate the textual pairwise comparisons of a pairwise matrix, one company at a time.
+
+    :param matrix: Pairwise comparison matrix.
+    :param companies: List of company names.
+    :return: Generator of lists with the comparisons of company i against the companies after it.
+    """
+    matrix = np.asarray(matrix)
+    for i in range(len(matrix) - 1):
+        yield [f"{companies[i]} is {preference_to_text(preference_num)} {companies[j]}"
+               for j, preference_num in enumerate(matrix[i, i + 1:].tolist(), start=i + 1)]
 
 
 def calculate_all_pairwise_matrices(company_data, criteria):
@@ -113,48 +126,72 @@ def calculate_all_pairwise_matrices(company_data, criteria):
     :param criteria: List of criteria metadata from list_criteria().
     :return: Dictionary of pairwise matrices for each criterion.
     """
-    pairwise_comparisons = {}
+    decision_matrix = build_decision_matrix(company_data, criteria)
+    tensor = calculate_pairwise_tensor(decision_matrix, [c["type"] for c in criteria])
 
-    for criterion in criteria:
-        criterion_id = criterion["id"]
-        criterion_name = criterion["name"]
-        criterion_type = criterion["type"]
-        values = [company[criterion_id] for company in company_data]
+    # Matrices are views into the single tensor, no per-criterion allocation
+    return {criterion["name"]: tensor[k] for k, criterion in enumerate(criteria)}
 
-        # Compute pairwise matrix for this criterion
-        pairwise_comparisons[criterion_name] = calculate_pairwise_matrix(values, criterion_type)
 
-    return pairwise_comparisons
+@timed_stage('matrix')
+def build_decision_matrix(company_data, criteria):
+    """
+    Build the decision matrix from company data.
+
+    :param company_data: Company data.
+    :param criteria: List of criteria metadata from list_criteria().
+    :return: Decision matrix (companies x criteria).
+    """
+    return np.array([
+        [company[criterion["id"]] for criterion in criteria]
+        for company in company_data
+    ], dtype=float)
 
 
-def aggregate_ahp_scores(company_data, alternative_weights, criteria_weights):
+@timed_stage('rank')
+def rank_ahp_scores(alternative_weights, criteria_weights, top_k=None, offset=0):
+    """
+    Aggregate the AHP scores and rank the companies.
+
+    :param alternative_weights: List of weights for each criterion (alternative weights).
+    :param criteria_weights: List of weights for each criterion.
+    :param top_k: Only rank the k best companies (after offset).
+    :param offset: Best companies to skip, for paging.
+    :return: Tuple of the aggregated scores (array in company order) and the ranked company indices, best first.
+    """
+    num_companies = len(alternative_weights[0]["weights"]) if alternative_weights else 0
+    aggregated_scores = np.zeros(num_companies)  # Initialize scores for all companies
+
+    # Calculate aggregated scores (same summation order as a per-company loop)
+    for criterion_index, criterion_weights in enumerate(alternative_weights):
+        aggregated_scores += np.asarray(criterion_weights["weights"]) * criteria_weights[criterion_index]
+
+    # Rank companies by scores (ties keep the company order)
+    return aggregated_scores, top_k_indices(aggregated_scores, top_k, offset)
+
+
+def aggregate_ahp_scores(company_data, alternative_weights, criteria_weights, top_k=None, offset=0):
     """
     Aggregate the AHP scores for ranking companies.
 
     :param alternative_weights: List of weights for each criterion (alternative weights).
     :param company_data: List of company data with financial indicators.
     :param criteria_weights: List of weights for each criterion.
+    :param top_k: Only return the k best companies (after offset).
+    :param offset: Best companies to skip, for paging.
     :return: Aggregated scores for each company.
     """
-    num_companies = len(company_data)
-    aggregated_scores = [0] * num_companies  # Initialize scores for all companies
+    aggregated_scores, ranking = rank_ahp_scores(alternative_weights, criteria_weights, top_k, offset)
 
-    # Calculate aggregated scores
-    for criterion_index, criterion_weights in enumerate(alternative_weights):
-        criterion_weight = criteria_weights[criterion_index]
-        for i, weight in enumerate(criterion_weights["weights"]):
-            aggregated_scores[i] += weight * criterion_weight
-
-    # Rank companies by scores
-    ranked_companies = sorted(
-        [{"name": company_data[i]["name"], "symbol": company_data[i]["symbol"], "score": aggregated_scores[i]} for i in range(num_companies)],
-        key=lambda x: x["score"],
-        reverse=True
-    )
+    ranked_companies = [
+        {"name": company_data[i]["name"], "symbol": company_data[i]["symbol"], "score": aggregated_scores[i]}
+        for i in ranking
+    ]
 
     return ranked_companies
 
 
+@timed_stage('matrix')
 def min_max_normalisation(decision_matrix, criterion_types):
     normalized_matrix = np.copy(decision_matrix)
     for i in range(decision_matrix.shape[1]):
@@ -169,36 +206,78 @@ def min_max_normalisation(decision_matrix, criterion_types):
     return normalized_matrix
 
 
+@timed_stage('fetch')
+def query_company_indicators(selected_company_ids, columns):
+    """
+    Fetch companies joined with their financial indicators in a single query.
+
+    :param selected_company_ids: List of company IDs to fetch data for (None for all companies).
+    :param columns: Names of the FinancialIndicator columns to select.
+    :return: Rows of (id, name, symbol, *columns) in the requested ID order (by ID for all companies).
+    """
+    query = db.session.query(
+        Company.id, Company.name, Company.symbol,
+        *[getattr(FinancialIndicator, column) for column in columns]
+    ).join(
+        FinancialIndicator, FinancialIndicator.company_id == Company.id
+    )
+    if selected_company_ids is not None:
+        query = query.filter(Company.id.in_(selected_company_ids))
+    rows = query.order_by(FinancialIndicator.id).all()
+
+    # Keep the first indicator row per company and restore the requested order (IN does not preserve it)
+    rows_by_id = {}
+    for row in rows:
+        rows_by_id.setdefault(row[0], row)
+
+    if selected_company_ids is None:
+        return [rows_by_id[company_id] for company_id in sorted(rows_by_id)]
+    return [rows_by_id[company_id] for company_id in dict.fromkeys(selected_company_ids) if company_id in rows_by_id]
+
+
 def fetch_company_data(selected_company_ids):
     """
     Fetch company data and financial indicators for selected companies.
 
     :param selected_company_ids: List of company IDs to fetch data for.
-    :return: Dictionary containing company names and financial indicators.
+    :return: List of dictionaries with company names and financial indicators, in the requested order.
+    """
+    criterion_ids = [criterion["id"] for criterion in list_criteria()]
+    rows = query_company_indicators(selected_company_ids, criterion_ids)
+
+    return [
+        {"id": row[0], "name": row[1], "symbol": row[2], **dict(zip(criterion_ids, row[3:]))}
+        for row in rows
+    ]
+
+
+def fetch_decision_matrix(selected_company_ids, criteria):
+    """
+    Fetch the decision matrix for selected companies.
+
+    :param selected_company_ids: List of company IDs to fetch data for.
+    :param criteria: List of criteria metadata from list_criteria().
+    :return: Tuple of company index (list of id/name/symbol dictionaries) and decision matrix (companies x criteria).
     """
-    companies = Company.query.filter(Company.id.in_(selected_company_ids)).all()
-    company_data = []
-
-    for company in companies:
-        # Fetch related financial indicators
-        financial_data = FinancialIndicator.query.filter_by(company_id=company.id).first()
-        if financial_data:
-            company_data.append({
-                "name": company.name,
-                "symbol": company.symbol,
-                "revenue": financial_data.revenue,
-                "profit": financial_data.profit,
-                "profit_change_percentage": financial_data.profit_change_percentage,
-                "revenue_change_percentage": financial_data.revenue_change_percentage,
-                "roe": financial_data.roe,
-                "price_to_earnings_ratio": financial_data.price_to_earnings_ratio,
-                "stock_volatility": financial_data.stock_volatility,
-                "dividend_yield": financial_data.dividend_yield,
-                "earnings_per_share": financial_data.earnings_per_share,
-                "EV_to_EBITDA": financial_data.EV_to_EBITDA
-            })
-    return company_data
+    rows = query_company_indicators(selected_company_ids, [criterion["id"] for criterion in criteria])
 
+    companies = [{"id": row[0], "name": row[1], "symbol": row[2]} for row in rows]
+    # Missing (NULL) indicators become NaN
+    decision_matrix = np.array([row[3:] for row in rows], dtype=float).reshape(len(rows), len(criteria))
+
+    return companies, decision_matrix
+
+
+def find_missing_criteria(decision_matrix, criteria):
+    """
+    Find criteria with missing values in the decision matrix.
+
+    :param decision_matrix: Decision matrix (companies x criteria).
+    :param criteria: List of criteria metadata from list_criteria().
+    :return: Names of criteria that have at least one missing value.
+    """
+    missing = np.isnan(decision_matrix).any(axis=0)
+    return [criteria[k]["name"] for k in np.flatnonzero(missing)]
 
 
 def list_criteria():
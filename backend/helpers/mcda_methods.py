@@ -0,0 +1,227 @@
+import numpy as np
+
+
+# Vectorized MCDA kernels. They follow the formulas of pyDecision's topsis_method and waspas_method,
+# but only return scores: no plotting and no printing on the request path.
+
+
+def benefit_mask(criterion_types):
+    """
+    Convert criterion types to a boolean mask.
+
+    :param criterion_types: Type of each criterion (max for benefit, min for cost).
+    :return: Boolean array, True for benefit criteria.
+    """
+    if any(criterion_type not in ("max", "min") for criterion_type in criterion_types):
+        raise ValueError("Invalid criterion_type. Use 'max' or 'min'.")
+    return np.array([criterion_type == "max" for criterion_type in criterion_types])
+
+
+def topsis_scores(decision_matrix, weights, criterion_types):
+    """
+    TOPSIS relative closeness to the ideal solution.
+
+    :param decision_matrix: Decision matrix (companies x criteria).
+    :param weights: Criteria weights, or a (scenarios x criteria) matrix of weight vectors.
+    :param criterion_types: Type of each criterion (max for benefit, min for cost).
+    :return: Relative closeness of each company (higher is better), (scenarios x companies) for stacked weights.
+    """
+    return topsis_closeness(topsis_normalisation(decision_matrix), weights, criterion_types)
+
+
+def topsis_normalisation(decision_matrix):
+    """
+    Vector normalisation used by TOPSIS (each column divided by its Euclidean norm).
+
+    :param decision_matrix: Decision matrix (companies x criteria).
+    :return: Normalised matrix (companies x criteria).
+    """
+    X = np.asarray(decision_matrix, dtype=float)
+    return X / np.sum(X * X, axis=0) ** (1 / 2)
+
+
+def topsis_closeness(normalized_matrix, weights, criterion_types):
+    """
+    TOPSIS relative closeness for an already normalised matrix.
+
+    :param normalized_matrix: Matrix from topsis_normalisation (companies x criteria).
+    :param weights: Criteria weights, or a (scenarios x criteria) matrix of weight vectors.
+    :param criterion_types: Type of each criterion (max for benefit, min for cost).
+    :return: Relative closeness of each company, (scenarios x companies) for stacked weights.
+    """
+    is_benefit = benefit_mask(criterion_types)
+
+    # Weighting (one weighted matrix per scenario for stacked weights)
+    v_ij = normalized_matrix * np.asarray(weights, dtype=float)[..., np.newaxis, :]
+
+    column_max = np.max(v_ij, axis=-2)
+    column_min = np.min(v_ij, axis=-2)
+    p_ideal = np.where(is_benefit, column_max, column_min)[..., np.newaxis, :]
+    n_ideal = np.where(is_benefit, column_min, column_max)[..., np.newaxis, :]
+
+    p_distance = np.sum((v_ij - p_ideal) ** 2, axis=-1) ** (1 / 2)
+    n_distance = np.sum((v_ij - n_ideal) ** 2, axis=-1) ** (1 / 2)
+    return n_distance / (p_distance + n_distance)
+
+
+def waspas_normalisation(decision_matrix, criterion_types):
+    """
+    Min-max normalisation shifted to [1, 2], as used by WSM, WPM and WASPAS.
+
+    :param decision_matrix: Decision matrix (companies x criteria).
+    :param criterion_types: Type of each criterion (max for benefit, min for cost).
+    :return: Normalised matrix (companies x criteria).
+    """
+    X = np.asarray(decision_matrix, dtype=float)
+    is_benefit = benefit_mask(criterion_types)
+
+    column_max = np.max(X, axis=0)
+    column_min = np.min(X, axis=0)
+    distance = np.where(is_benefit, X - column_min, column_max - X)
+    return 1 + distance / (column_max - column_min)
+
+
+def wsm_scores(normalized_matrix, weights):
+    """
+    Weighted Sum Model scores.
+
+    :param normalized_matrix: Matrix from waspas_normalisation (companies x criteria).
+    :param weights: Criteria weights, or a (scenarios x criteria) matrix of weight vectors.
+    :return: WSM score of each company, (scenarios x companies) for stacked weights.
+    """
+    w = np.asarray(weights, dtype=float)
+    if w.ndim == 2:
+        return w @ normalized_matrix.T
+    return np.sum(normalized_matrix * w, axis=1)
+
+
+def wpm_scores(normalized_matrix, weights):
+    """
+    Weighted Product Model scores.
+
+    :param normalized_matrix: Matrix from waspas_normalisation (companies x criteria).
+    :param weights: Criteria weights, or a (scenarios x criteria) matrix of weight vectors.
+    :return: WPM score of each company, (scenarios x companies) for stacked weights.
+    """
+    w = np.asarray(weights, dtype=float)
+    if w.ndim == 2:
+        # Products of powers as one matrix product in log space (normalised values are >= 1)
+        return np.exp(w @ np.log(normalized_matrix).T)
+    return np.prod(normalized_matrix ** w, axis=1)
+
+
+def waspas_scores(decision_matrix, criterion_types, weights, lambda_value):
+    """
+    WSM, WPM and their WASPAS combination.
+
+    :param decision_matrix: Decision matrix (companies x criteria).
+    :param criterion_types: Type of each criterion (max for benefit, min for cost).
+    :param weights: Criteria weights, or a (scenarios x criteria) matrix of weight vectors.
+    :param lambda_value: Weight of WSM in the combination (1 - lambda_value goes to WPM), one per scenario for stacked weights.
+    :return: Tuple of WSM, WPM and WASPAS scores.
+    """
+    normalized_matrix = waspas_normalisation(decision_matrix, criterion_types)
+    wsm = wsm_scores(normalized_matrix, weights)
+    wpm = wpm_scores(normalized_matrix, weights)
+    if np.ndim(lambda_value) == 1:
+        lambda_value = np.asarray(lambda_value, dtype=float)[:, np.newaxis]
+    return wsm, wpm, lambda_value * wsm + (1 - lambda_value) * wpm
+
+
+PREFERENCE_FUNCTIONS = ('t1', 't2', 't3', 't4', 't5', 't6', 't7')
+
+
+def preference_degree(d, f, q, s, p):
+    """
+    PROMETHEE preference function applied to an array of pairwise differences.
+
+    Mirrors pyDecision's preference_degree, including 't7' leaving negative differences unchanged.
+
+    :param d: Differences a_i - a_j for one criterion.
+    :param f: Preference function type ('t1' ... 't7').
+    :param q: Indifference threshold.
+    :param s: Gaussian / intermediate parameter.
+    :param p: Preference threshold.
+    :return: Preference degrees, same shape as d.
+    """
+    # All branches are evaluated, so silence warnings from branches that are not selected (e.g. p = 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if f == 't1':  # Usual
+            return np.where(d <= 0, 0.0, 1.0)
+        if f == 't2':  # U-shape
+            return np.where(d <= q, 0.0, 1.0)
+        if f == 't3':  # V-shape
+            return np.select([d <= 0, d <= p], [0.0, d / p], 1.0)
+        if f == 't4':  # Level
+            return np.select([d <= q, d <= p], [0.0, 0.5], 1.0)
+        if f == 't5':  # V-shape with indifference
+            return np.select([d <= q, d <= p], [0.0, (d - q) / (p - q)], 1.0)
+        if f == 't6':  # Gaussian
+            return np.where(d <= 0, 0.0, 1 - np.exp(-(d ** 2) / (2 * s ** 2)))
+        if f == 't7':  # C-shape
+            return np.select([d == 0, (d > 0) & (d <= s), d > s], [0.0, (d / s) ** 0.5, 1.0], d)
+    raise ValueError(f"Invalid preference function '{f}'. Use one of {', '.join(PREFERENCE_FUNCTIONS)}.")
+
+
+def promethee_ii_criterion_flows(decision_matrix, Q, S, P, F, block_size=256):
+    """
+    Unweighted PROMETHEE II net flow sums of every company on every criterion.
+
+    Net flows are linear in the weights, so any weight vector W gives
+    flows = criterion_flows @ W / sum(W) / (n - 1) without recomputing the pairwise preferences.
+    Pairwise differences are computed with broadcasting one block of rows at a time, so peak memory is
+    O(block_size x n) instead of O(n^2).
+
+    :param decision_matrix: Normalised decision matrix (companies x criteria).
+    :param Q: Indifference thresholds.
+    :param S: Gaussian / intermediate parameters.
+    :param P: Preference thresholds.
+    :param F: Preference function type of each criterion ('t1' ... 't7').
+    :param block_size: Number of rows compared at once.
+    :return: Matrix (companies x criteria) of outgoing minus incoming preference sums.
+    """
+    X = np.asarray(decision_matrix, dtype=float)
+    n, m = X.shape
+    if not all(np.ndim(parameter) == 1 and len(parameter) == m for parameter in (Q, S, P, F)):
+        raise ValueError("W, Q, S, P and F must have one value per criterion.")
+    if block_size < 1:
+        raise ValueError("block_size must be a positive integer.")
+
+    criterion_flows = np.zeros((n, m))
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        diagonal = (np.arange(stop - start), np.arange(start, stop))
+
+        for k in range(m):
+            d = X[start:stop, k, np.newaxis] - X[np.newaxis, :, k]
+            pd_block = preference_degree(d, F[k], Q[k], S[k], P[k])
+
+            # An alternative is never preferred to itself
+            pd_block[diagonal] = 0
+
+            criterion_flows[start:stop, k] += np.sum(pd_block, axis=1)
+            criterion_flows[:, k] -= np.sum(pd_block, axis=0)
+
+    return criterion_flows
+
+
+def promethee_ii_flows(decision_matrix, W, Q, S, P, F, block_size=256):
+    """
+    PROMETHEE II net outranking flows.
+
+    :param decision_matrix: Normalised decision matrix (companies x criteria).
+    :param W: Criteria weights, or a (scenarios x criteria) matrix of weight vectors.
+    :param Q: Indifference thresholds.
+    :param S: Gaussian / intermediate parameters.
+    :param P: Preference thresholds.
+    :param F: Preference function type of each criterion ('t1' ... 't7').
+    :param block_size: Number of rows compared at once.
+    :return: Net flow of each company (higher is better), (scenarios x companies) for stacked weights.
+    """
+    W = np.asarray(W, dtype=float)
+    if W.ndim not in (1, 2) or W.shape[-1] != np.shape(decision_matrix)[1]:
+        raise ValueError("W, Q, S, P and F must have one value per criterion.")
+
+    criterion_flows = promethee_ii_criterion_flows(decision_matrix, Q, S, P, F, block_size)
+    n = criterion_flows.shape[0]
+    return (W @ criterion_flows.T) / np.sum(W, axis=-1, keepdims=W.ndim == 2) / (n - 1)
@@ -0,0 +1,325 @@
+import atexit
+import os
+import sqlite3
+import threading
+from bisect import bisect_left
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from flask import current_app, make_response
+
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds (seconds) of the latency histogram buckets, +Inf is implied
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stage timings of the request being handled; None outside an instrumented route
+_request_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Stage durations and row count of one request.
+
+    Durations are exclusive: time spent in a stage nested in another one is only counted for the inner stage,
+    so the stages of a request never add up to more than its total.
+    """
+
+    __slots__ = ('durations', 'rows', 'current')
+
+    def __init__(self):
+        self.durations = {}  # Stage name -> seconds, in first-seen order
+        self.rows = 0
+        self.current = None  # Innermost open stage
+
+
+class Stage:
+    """
+    Context manager timing a stage of the current request (no-op outside an instrumented route).
+
+    Usage: with Stage('fetch'): ...
+    """
+
+    __slots__ = ('name', 'timings', 'parent', 'nested', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = timings = _request_timings.get()
+        if timings is not None:
+            self.parent = timings.current
+            self.nested = 0.0
+            timings.current = self
+            self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        timings = self.timings
+        if timings is not None:
+            elapsed = perf_counter() - self.start
+            timings.current = self.parent
+            if self.parent is not None:
+                self.parent.nested += elapsed
+            timings.durations[self.name] = timings.durations.get(self.name, 0.0) + elapsed - self.nested
+        return False
+
+
+def timed_stage(name):
+    """
+    Decorator timing every call of a function as a stage of the current request.
+
+    :param name: Stage name, e.g. 'fetch' or 'matrix'.
+    :return: Decorator.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with Stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_rows(count):
+    """
+    Count the decision-matrix rows (companies) handled by the current request.
+
+    :param count: Number of rows.
+    :return: None
+    """
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.rows += count
+
+
+class MetricsRegistry:
+    """
+    Latency histograms and counters of the instrumented routes, rendered in the Prometheus text format.
+
+    Requests only add to in-process deltas. With a path, a background timer adds the deltas to a SQLite file
+    shared by all gunicorn workers on the host at most every flush_interval seconds. /metrics then reports the
+    sums over all workers, so the counters never go backwards between scrapes, whichever worker serves them.
+    Without a path the values stay in the process (single-process servers).
+    """
+
+    def __init__(self, path=None, flush_interval=1.0, buckets=LATENCY_BUCKETS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.pending = {}  # (metric, labels, field) -> value added since the last flush
+        self.flush_timer = None
+
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._connect() as connection:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS samples ('
+                    'metric TEXT NOT NULL, labels TEXT NOT NULL, field TEXT NOT NULL, value REAL NOT NULL, '
+                    'PRIMARY KEY (metric, labels, field))'
+                )
+            atexit.register(self.flush)
+
+    @contextmanager
+    def _connect(self):
+        # A sqlite3 connection used as a context manager only commits or rolls back, so close it as well
+        with closing(sqlite3.connect(self.path, timeout=5)) as connection, connection:
+            yield connection
+
+    def _add(self, key, value):
+        self.pending[key] = self.pending.get(key, 0) + value
+
+    def _observe(self, metric, labels, value):
+        self._add((metric, labels, f'bucket{bisect_left(self.buckets, value)}'), 1)
+        self._add((metric, labels, 'sum'), value)
+        self._add((metric, labels, 'count'), 1)
+
+    def observe_request(self, method, status, total, durations, rows):
+        """
+        Record one finished request.
+
+        :param method: Route label, e.g. 'ahp'.
+        :param status: HTTP status code.
+        :param total: Request duration in seconds.
+        :param durations: Dictionary of stage name to seconds.
+        :param rows: Decision-matrix rows handled.
+        :return: None
+        """
+        method_labels = f'method="{method}"'
+        with self.lock:
+            self._observe('mcda_request_duration_seconds', method_labels, total)
+            for name, duration in durations.items():
+                self._observe('mcda_stage_duration_seconds', f'{method_labels},stage="{name}"', duration)
+            self._add(('mcda_requests_total', f'{method_labels},status="{status}"', 'value'), 1)
+            self._add(('mcda_rows_total', method_labels, 'value'), rows)
+
+            if self.path and self.flush_timer is None:
+                self.flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self.flush_timer.daemon = True
+                self.flush_timer.start()
+
+    def flush(self):
+        """
+        Add the pending deltas to the shared file.
+
+        :return: None
+        """
+        if not self.path:
+            return
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flush_timer = None
+        if not pending:
+            return
+
+        try:
+            with self._connect() as connection:
+                connection.executemany(
+                    'INSERT INTO samples (metric, labels, field, value) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (metric, labels, field) DO UPDATE SET value = value + excluded.value',
+                    [(*key, value) for key, value in pending.items()]
+                )
+        except sqlite3.Error:
+            # Keep the deltas for the next flush (e.g. the file was locked past the timeout)
+            with self.lock:
+                for key, value in pending.items():
+                    self._add(key, value)
+
+    def samples(self):
+        """
+        :return: Dictionary of (metric, labels, field) to value, over all workers when the values are shared.
+        """
+        if not self.path:
+            with self.lock:
+                return dict(self.pending)
+
+        self.flush()
+        with self._connect() as connection:
+            return {(metric, labels, field): value for metric, labels, field, value
+                    in connection.execute('SELECT metric, labels, field, value FROM samples')}
+
+    def render(self):
+        """
+        :return: All metrics in the Prometheus text exposition format.
+        """
+        samples = self.samples()
+        lines = []
+
+        def series(metric):
+            return sorted({labels for name, labels, _ in samples if name == metric})
+
+        def histogram(metric, help_text):
+            lines.extend([f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram'])
+            for labels in series(metric):
+                cumulative = 0
+                for index, bound in enumerate(self.buckets + (float('inf'),)):
+                    cumulative += samples.get((metric, labels, f'bucket{index}'), 0)
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative:g}')
+                lines.append(f'{metric}_sum{{{labels}}} {samples[(metric, labels, "sum")]!r}')
+                lines.append(f'{metric}_count{{{labels}}} {samples[(metric, labels, "count")]:g}')
+
+        def counter(metric, help_text):
+            lines.extend([f'# HELP {metric} {help_text}', f'# TYPE {metric} counter'])
+            for labels in series(metric):
+                lines.append(f'{metric}{{{labels}}} {samples[(metric, labels, "value")]:g}')
+
+        histogram('mcda_request_duration_seconds', 'Duration of the analyze requests.')
+        histogram('mcda_stage_duration_seconds', 'Exclusive duration of the stages of the analyze requests.')
+        counter('mcda_requests_total', 'Analyze requests by status code.')
+        counter('mcda_rows_total', 'Decision-matrix rows (companies) handled.')
+        return '\n'.join(lines) + '\n'
+
+
+def get_metrics_registry():
+    """
+    Get the metrics registry of the current app, shared through Config.METRICS_PATH when it is set.
+
+    :return: MetricsRegistry.
+    """
+    if 'metrics' not in current_app.extensions:
+        config = current_app.config
+        current_app.extensions['metrics'] = MetricsRegistry(config.get('METRICS_PATH') or None,
+                                                            config.get('METRICS_FLUSH_INTERVAL', 1.0))
+    return current_app.extensions['metrics']
+
+
+def server_timing_header(durations, total):
+    """
+    Build a Server-Timing header value, e.g. "fetch;dur=1.204, compute;dur=3.870, total;dur=5.512".
+
+    :param durations: Dictionary of stage name to seconds.
+    :param total: Request duration in seconds.
+    :return: Header value with the durations in milliseconds.
+    """
+    return ', '.join(f'{name};dur={duration * 1000:.3f}' for name, duration in (*durations.items(), ('total', total)))
+
+
+def timed_route(method):
+    """
+    Decorator instrumenting a route: collects its stage timings, records them in the metrics registry and adds a
+    Server-Timing header.
+
+    A streamed response is recorded once its body has been generated; the time spent producing each chunk is
+    the 'stream' stage. Its Server-Timing header can only cover the work before the body.
+
+    :param method: Route label used in the metrics, e.g. 'ahp'.
+    :return: Decorator.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            registry = get_metrics_registry()
+            timings = RequestTimings()
+            token = _request_timings.set(timings)
+            start = perf_counter()
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                registry.observe_request(method, 500, perf_counter() - start, timings.durations, timings.rows)
+                raise
+            finally:
+                _request_timings.reset(token)
+
+            response.headers['Server-Timing'] = server_timing_header(timings.durations, perf_counter() - start)
+            if response.is_streamed:
+                def finish():
+                    registry.observe_request(method, response.status_code, perf_counter() - start,
+                                             timings.durations, timings.rows)
+
+                response.response = _timed_body(response.response, timings, finish)
+            else:
+                registry.observe_request(method, response.status_code, perf_counter() - start, timings.durations,
+                                         timings.rows)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _timed_body(body, timings, finish):
+    # Generate a streamed body with the request's timings active, then record the request
+    iterator = iter(body)
+    try:
+        while True:
+            token = _request_timings.set(timings)
+            try:
+                with Stage('stream'):
+                    chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                _request_timings.reset(token)
+            yield chunk
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+        finish()
@@ -0,0 +1,68 @@
+import numpy as np
+
+
+def parse_page(data):
+    """
+    Read the top_k and offset parameters of an analyze request.
+
+    :param data: JSON request payload.
+    :return: Tuple of top_k (None for all companies) and offset.
+    :raises ValueError: For an invalid top_k or offset.
+    """
+    try:
+        top_k = int(data['top_k']) if data.get('top_k') is not None else None
+        offset = int(data.get('offset') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid top_k or offset')
+
+    if top_k is not None and top_k < 1:
+        raise ValueError('top_k must be at least 1')
+    if offset < 0:
+        raise ValueError('offset must not be negative')
+    return top_k, offset
+
+
+def top_k_indices(scores, top_k=None, offset=0):
+    """
+    Indices of the companies ranked offset + 1 to offset + top_k, best (highest score) first.
+
+    Only the companies scoring at least the (offset + top_k)-th best score are selected with np.argpartition and
+    sorted, i.e. O(n + k log k) instead of a full sort. Ties keep the company order, like a stable sort.
+    NaN scores rank last.
+
+    :param scores: Score of each company.
+    :param top_k: Companies to return (None for all).
+    :param offset: Best companies to skip, for paging.
+    :return: Array of company indices.
+    """
+    scores = np.asarray(scores, dtype=float)
+    # A NaN would become the partition threshold and empty the page
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    n = len(scores)
+    end = n if top_k is None else min(offset + top_k, n)
+    if offset >= end:
+        return np.array([], dtype=np.intp)
+
+    if end < n:
+        # Threshold: the end-th best score; keep every company reaching it (ties included)
+        threshold = scores[np.argpartition(-scores, end - 1)[end - 1]]
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(n)
+
+    # Score descending, then company order
+    order = candidates[np.lexsort((candidates, -scores[candidates]))]
+    return order[offset:end]
+
+
+def page_info(total, top_k=None, offset=0):
+    """
+    Paging fields of a ranked response.
+
+    :param total: Number of ranked companies.
+    :param top_k: Page size (None for all).
+    :param offset: Offset of the page.
+    :return: Dictionary with total, offset and next_offset (None on the last page).
+    """
+    end = total if top_k is None else min(offset + top_k, total)
+    return {"total": total, "offset": offset, "next_offset": end if end < total else None}
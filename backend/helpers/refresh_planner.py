@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from app import db
+from app.models import FetchLog, FinancialIndicator
+from helpers.bulk_upsert import upsert_financial_indicators
+from helpers.data_version import bump_data_version
+from helpers.indicator_history import append_indicator_history
+
+
+# Data older than this is fetched again
+REFRESH_MAX_AGE = timedelta(hours=float(os.getenv('REFRESH_MAX_AGE_HOURS', 24)))
+
+# Companies with a missing (NULL) field are retried once their last fetch is older than this
+REFRESH_RETRY_MISSING_AFTER = timedelta(hours=float(os.getenv('REFRESH_RETRY_MISSING_HOURS', 1)))
+
+# Companies written per transaction, so an interrupted run keeps the finished checkpoints
+REFRESH_CHECKPOINT_SIZE = int(os.getenv('REFRESH_CHECKPOINT_SIZE', 50))
+
+
+def payload_hash(payload):
+    """
+    Hash a response payload independently of its key order.
+
+    :param payload: JSON-serialisable payload.
+    :return: SHA-256 hex digest.
+    """
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_fetch_log(source):
+    """
+    Load the fetch log of a data source.
+
+    :param source: Data source name, e.g. 'fmp_key_metrics'.
+    :return: Dictionary of company ID to FetchLog.
+    """
+    return {entry.company_id: entry for entry in FetchLog.query.filter_by(source=source)}
+
+
+def companies_missing_fields(fields):
+    """
+    Find the companies where any of the fields is NULL (or that have no indicator row).
+
+    :param fields: FinancialIndicator column names.
+    :return: Set of company IDs with a financial indicator row missing a field.
+    """
+    columns = [getattr(FinancialIndicator, field) for field in fields]
+    query = db.session.query(FinancialIndicator.company_id).filter(or_(*[column.is_(None) for column in columns]))
+    return {company_id for company_id, in query}
+
+
+def plan_refresh(companies, source, fields, full=False, now=None):
+    """
+    Select the companies to fetch from a data source.
+
+    A company is fetched when it was never fetched from the source, when its last fetch is older than
+    REFRESH_MAX_AGE, or when one of the source's fields is missing and the last fetch is older than
+    REFRESH_RETRY_MISSING_AFTER. Companies fetched by an interrupted run are therefore not fetched again.
+
+    :param companies: Candidate companies.
+    :param source: Data source name.
+    :param fields: FinancialIndicator columns filled by the source.
+    :param full: Fetch every company regardless of freshness.
+    :param now: Current time (UTC).
+    :return: Tuple of the companies to fetch (in input order) and the fetch log of the source.
+    """
+    now = now or datetime.utcnow()
+    fetch_log = load_fetch_log(source)
+    if full:
+        return list(companies), fetch_log
+
+    with_indicators = {company_id for company_id, in db.session.query(FinancialIndicator.company_id)}
+    missing = companies_missing_fields(fields)
+
+    plan = []
+    for company in companies:
+        entry = fetch_log.get(company.id)
+        if entry is None or company.id not in with_indicators:
+            plan.append(company)
+            continue
+
+        age = now - entry.fetched_at
+        if age >= REFRESH_MAX_AGE or (company.id in missing and age >= REFRESH_RETRY_MISSING_AFTER):
+            plan.append(company)
+    return plan, fetch_log
+
+
+def record_fetch(fetch_log, company_id, source, payload, now=None):
+    """
+    Stamp a successful fetch in the fetch log (added to the session, committed with the checkpoint).
+
+    :param fetch_log: Fetch log of the source from plan_refresh (updated in place).
+    :param company_id: Company ID.
+    :param source: Data source name.
+    :param payload: Raw response entry.
+    :param now: Fetch time (UTC).
+    :return: True if the payload differs from the previous fetch (or the company was never fetched), so
+        unchanged payloads can skip the indicator update.
+    """
+    digest = payload_hash(payload)
+    entry = fetch_log.get(company_id)
+    if entry is None:
+        entry = FetchLog(company_id=company_id, source=source)
+        db.session.add(entry)
+        fetch_log[company_id] = entry
+
+    changed = entry.payload_hash != digest
+    entry.payload_hash = digest
+    entry.fetched_at = now or datetime.utcnow()
+    return changed
+
+
+def commit_checkpoint(values_by_company, counts):
+    """
+    Write the values of one checkpoint, the changed history rows and the pending fetch-log entries in one transaction.
+
+    History rows and a new data version are only written when indicator rows were inserted or updated, so a
+    checkpoint that only stamps the fetch log keeps the cached analyses valid.
+
+    :param values_by_company: Dictionary of company ID to indicator column values.
+    :param counts: Running inserted/updated/skipped counts (updated in place).
+    :return: None
+    """
+    written = upsert_financial_indicators(values_by_company)
+    for key, value in written.items():
+        counts[key] += value
+    if written["inserted"] or written["updated"]:
+        append_indicator_history()
+        bump_data_version()
+    db.session.commit()
+
+
+def checkpoints(items, size=None):
+    """
+    Split the planned companies into checkpoints.
+
+    :param items: Planned companies.
+    :param size: Companies per checkpoint (REFRESH_CHECKPOINT_SIZE by default).
+    :return: List of lists.
+    """
+    size = size or REFRESH_CHECKPOINT_SIZE
+    return [items[start:start + size] for start in range(0, len(items), size)]
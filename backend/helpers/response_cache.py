@@ -0,0 +1,220 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from contextlib import closing, contextmanager
+
+from config import BASE_DIR
+
+
+# 'on' caches provider responses, 'offline' serves only from the cache (no network), 'off' disables it
+RESPONSE_CACHE_MODE = os.getenv('RESPONSE_CACHE_MODE', 'on')
+RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', os.path.join(BASE_DIR, 'app/shared/response_cache.db'))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Seconds a response stays fresh, per endpoint; override with e.g. RESPONSE_CACHE_TTLS="profile=3600,search=86400"
+DEFAULT_TTLS = {
+    'key-metrics-ttm': 12 * 3600,
+    'profile': 12 * 3600,
+    'quote': 300,
+    'search': 7 * 24 * 3600,
+    'OVERVIEW': 12 * 3600,
+}
+DEFAULT_TTL = 3600
+
+# Query parameters that do not change the response
+IGNORED_PARAMS = {'apikey'}
+
+
+def parse_ttls(value):
+    """
+    Parse per-endpoint TTL overrides.
+
+    :param value: String like 'profile=3600,search=86400'.
+    :return: Dictionary of endpoint to seconds.
+    """
+    ttls = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        endpoint, _, seconds = item.partition('=')
+        ttls[endpoint.strip()] = int(seconds)
+    return ttls
+
+
+class ResponseCache:
+    """
+    On-disk cache of provider API responses in a local SQLite file.
+
+    Bodies are stored zlib-compressed under the SHA-256 of their content, so identical responses to different
+    requests are stored once. Requests expire after the TTL of their endpoint and the least recently used ones
+    are evicted once the compressed bodies exceed max_bytes. In offline mode entries never expire and
+    get_json raises OfflineCacheMiss on a miss instead of going to the network.
+    """
+
+    def __init__(self, path, ttls=None, max_bytes=256 * 1024 * 1024, offline=False):
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, content_hash TEXT NOT NULL, '
+                'stored_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS bodies (content_hash TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_responses_content_hash ON responses (content_hash)')
+
+    @contextmanager
+    def _connect(self):
+        # A sqlite3 connection used as a context manager only commits or rolls back, so close it as well
+        with closing(sqlite3.connect(self.path, timeout=5)) as connection, connection:
+            yield connection
+
+    @staticmethod
+    def request_key(url, params=None):
+        """
+        Key of a request: its URL and query parameters in sorted order, without the API key.
+
+        :param url: Request URL.
+        :param params: Query parameters.
+        :return: SHA-256 hex digest.
+        """
+        query = sorted((str(key), str(value)) for key, value in (params or {}).items() if key not in IGNORED_PARAMS)
+        return hashlib.sha256(repr((url, query)).encode()).hexdigest()
+
+    def get(self, url, params, endpoint):
+        """
+        Get a cached response body.
+
+        :param url: Request URL.
+        :param params: Query parameters.
+        :param endpoint: Endpoint name, selects the TTL.
+        :return: Raw body (bytes), or None on a miss.
+        """
+        now = time.time()
+        key = self.request_key(url, params)
+        oldest = 0 if self.offline else now - self.ttls.get(endpoint, DEFAULT_TTL)
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT bodies.body FROM responses JOIN bodies ON bodies.content_hash = responses.content_hash '
+                'WHERE responses.key = ? AND responses.stored_at >= ?', (key, oldest)
+            ).fetchone()
+            if row is not None:
+                connection.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+
+        with self.lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return zlib.decompress(row[0])
+
+    def set(self, url, params, endpoint, body):
+        """
+        Store a response body.
+
+        :param url: Request URL.
+        :param params: Query parameters.
+        :param endpoint: Endpoint name.
+        :param body: Raw body (bytes).
+        :return: None
+        """
+        now = time.time()
+        content_hash = hashlib.sha256(body).hexdigest()
+        compressed = zlib.compress(body, 6)
+        if len(compressed) > self.max_bytes:
+            return
+
+        key = self.request_key(url, params)
+        with self._connect() as connection:
+            previous = connection.execute('SELECT content_hash FROM responses WHERE key = ?', (key,)).fetchone()
+            connection.execute('INSERT OR IGNORE INTO bodies (content_hash, body, size) VALUES (?, ?, ?)',
+                               (content_hash, compressed, len(compressed)))
+            connection.execute(
+                'INSERT OR REPLACE INTO responses (key, endpoint, content_hash, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, endpoint, content_hash, now, now)
+            )
+            if previous is not None and previous[0] != content_hash:
+                self._delete_unreferenced(connection, [previous])
+            self._evict(connection)
+
+    @staticmethod
+    def _delete_unreferenced(connection, content_hashes):
+        connection.executemany(
+            'DELETE FROM bodies WHERE content_hash = ? AND NOT EXISTS '
+            '(SELECT 1 FROM responses WHERE responses.content_hash = bodies.content_hash)', content_hashes
+        )
+
+    def _evict(self, connection):
+        # Evict least recently used requests, and their bodies, until the cache fits
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evict = []
+        rows = connection.execute('SELECT responses.key, responses.content_hash, bodies.size FROM responses '
+                                  'JOIN bodies ON bodies.content_hash = responses.content_hash ORDER BY accessed_at')
+        for key, content_hash, size in rows:
+            if total <= self.max_bytes:
+                break
+            evict.append((key, content_hash))
+            total -= size  # Approximate for bodies shared by several requests
+        connection.executemany('DELETE FROM responses WHERE key = ?', [(key,) for key, _ in evict])
+        self._delete_unreferenced(connection, [(content_hash,) for _, content_hash in evict])
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM responses')
+            connection.execute('DELETE FROM bodies')
+
+    def stats(self):
+        with self._connect() as connection:
+            entries = connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            bodies, size = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM bodies').fetchone()
+        with self.lock:
+            return {"mode": 'offline' if self.offline else 'on', "hits": self.hits, "misses": self.misses,
+                    "entries": entries, "bodies": bodies, "bytes": size, "max_bytes": self.max_bytes}
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Get the response cache selected by RESPONSE_CACHE_MODE ('on', 'offline' or 'off').
+
+    :return: ResponseCache shared by the ingestion scripts of this process, or None when disabled.
+    """
+    global _response_cache
+
+    if RESPONSE_CACHE_MODE not in ('on', 'offline', 'off'):
+        raise ValueError(f"Invalid RESPONSE_CACHE_MODE '{RESPONSE_CACHE_MODE}'. Use 'on', 'offline' or 'off'.")
+    if RESPONSE_CACHE_MODE == 'off':
+        return None
+
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(RESPONSE_CACHE_PATH, parse_ttls(os.getenv('RESPONSE_CACHE_TTLS')),
+                                            RESPONSE_CACHE_MAX_BYTES, offline=RESPONSE_CACHE_MODE == 'offline')
+        return _response_cache
+
+
+# Inspect or clear the cache: python -m helpers.response_cache [stats|clear]
+if __name__ == '__main__':
+    cache = ResponseCache(RESPONSE_CACHE_PATH, max_bytes=RESPONSE_CACHE_MAX_BYTES)
+    if sys.argv[1:] == ['clear']:
+        cache.clear()
+    print(cache.stats())
@@ -0,0 +1,146 @@
+import json
+
+import numpy as np
+from flask import current_app, request
+
+from helpers.metrics import timed_stage
+
+try:
+    import msgpack
+except ImportError:  # Optional: application/x-msgpack is not offered without it
+    msgpack = None
+
+try:
+    import pyarrow
+except ImportError:  # Optional: Arrow IPC streams are not offered without it
+    pyarrow = None
+
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+
+def available_formats():
+    """
+    Response formats of the analyze endpoints, JSON first (the default).
+
+    :return: List of MIME types whose encoder is installed.
+    """
+    formats = [JSON_MIMETYPE]
+    if msgpack is not None:
+        formats.append(MSGPACK_MIMETYPE)
+    if pyarrow is not None:
+        formats.append(ARROW_MIMETYPE)
+    return formats
+
+
+def negotiate_format():
+    """
+    Select the response format from the Accept header of the current request.
+
+    :return: MIME type; JSON when the header is missing, */* or names no available format.
+    """
+    return request.accept_mimetypes.best_match(available_formats(), default=JSON_MIMETYPE)
+
+
+def pack_msgpack(arrays, meta):
+    """
+    Encode arrays and metadata as MessagePack.
+
+    Each array is a map of dtype, shape and its raw bytes (C order), taken from the NumPy buffer without
+    converting the values to Python objects.
+
+    :param arrays: Dictionary of name to NumPy array.
+    :param meta: JSON-serialisable dictionary (company names, criterion names, ...).
+    :return: bytes
+    """
+    encoded = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        encoded[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "data": memoryview(array)}
+    return msgpack.packb({"meta": meta, "arrays": encoded}, use_bin_type=True)
+
+
+def unpack_msgpack(body):
+    """
+    Decode a body from pack_msgpack().
+
+    :param body: bytes
+    :return: Tuple of a dictionary of name to NumPy array (read-only views of the body) and the metadata.
+    """
+    payload = msgpack.unpackb(body, raw=False)
+    arrays = {
+        name: np.frombuffer(array["data"], dtype=array["dtype"]).reshape(array["shape"])
+        for name, array in payload["arrays"].items()
+    }
+    return arrays, payload["meta"]
+
+
+def pack_arrow(arrays, meta):
+    """
+    Encode arrays and metadata as an Arrow IPC stream.
+
+    The stream holds one record batch with a single row and one fixed-shape tensor column per array, so every
+    array keeps its shape and is written from its NumPy buffer. Arrow has no zero-size tensors: an empty array
+    (e.g. the ranking of a page past the last company) is written as an empty list with its shape in the field
+    metadata. The metadata is stored as JSON under the 'meta' key of the schema metadata.
+
+    :param arrays: Dictionary of name to NumPy array.
+    :param meta: JSON-serialisable dictionary.
+    :return: bytes
+    """
+    fields, columns = [], []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.size:
+            column = pyarrow.FixedShapeTensorArray.from_numpy_ndarray(array.reshape((1,) + array.shape))
+            fields.append(pyarrow.field(name, column.type))
+        else:
+            column = pyarrow.array([[]], type=pyarrow.list_(pyarrow.from_numpy_dtype(array.dtype)))
+            fields.append(pyarrow.field(name, column.type, metadata={"shape": json.dumps(array.shape)}))
+        columns.append(column)
+    schema = pyarrow.schema(fields, metadata={"meta": json.dumps(meta)})
+    batch = pyarrow.RecordBatch.from_arrays(columns, schema=schema)
+
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def unpack_arrow(body):
+    """
+    Decode a body from pack_arrow().
+
+    :param body: bytes
+    :return: Tuple of a dictionary of name to NumPy array and the metadata.
+    """
+    table = pyarrow.ipc.open_stream(body).read_all()
+    arrays = {}
+    for field in table.schema:
+        if field.metadata and b'shape' in field.metadata:
+            arrays[field.name] = np.empty(json.loads(field.metadata[b'shape']),
+                                          dtype=field.type.value_type.to_pandas_dtype())
+        else:
+            arrays[field.name] = table.column(field.name).combine_chunks().to_numpy_ndarray()[0]
+    return arrays, json.loads(table.schema.metadata[b'meta'])
+
+
+@timed_stage('serialize')
+def binary_response(response_format, arrays, meta):
+    """
+    Build a MessagePack or Arrow response of an analyze endpoint.
+
+    :param response_format: MIME type from negotiate_format().
+    :param arrays: Dictionary of name to NumPy array (scores, weights, matrices).
+    :param meta: JSON-serialisable dictionary with the non-numeric results.
+    :return: Flask response.
+    """
+    if response_format == MSGPACK_MIMETYPE:
+        body = pack_msgpack(arrays, meta)
+    elif response_format == ARROW_MIMETYPE:
+        body = pack_arrow(arrays, meta)
+    else:
+        raise ValueError(f"Unsupported response format '{response_format}'")
+    return current_app.response_class(body, mimetype=response_format)
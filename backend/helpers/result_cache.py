@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from helpers.data_version import get_data_version
+from helpers.metrics import Stage
+from helpers.response_format import JSON_MIMETYPE, negotiate_format
+
+
+class MemoryResultCache:
+    """
+    In-process LRU cache of serialized analyze responses with a TTL and a total size limit in bytes.
+    """
+
+    backend = 'memory'
+
+    def __init__(self, ttl, max_bytes):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (expires_at, body)
+        self.size = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        with self.lock:
+            self._check_version(version)
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, body, version):
+        if len(body) > self.max_bytes:
+            return
+
+        with self.lock:
+            self._check_version(version)
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, body)
+            self.size += len(body)
+
+            # Evict least recently used entries until the cache fits
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {"backend": self.backend, "hits": self.hits, "misses": self.misses,
+                    "entries": len(self.entries), "bytes": self.size, "max_bytes": self.max_bytes}
+
+    def _remove(self, key):
+        _, body = self.entries.pop(key)
+        self.size -= len(body)
+
+    def _check_version(self, version):
+        # Entries of an older data version can never be hit again, drop them at once
+        if version != self.version:
+            self.entries.clear()
+            self.size = 0
+            self.version = version
+
+
+class SQLiteResultCache:
+    """
+    Result cache in a local SQLite file, shared by all gunicorn workers on the host.
+
+    Hit/miss counters are kept per process.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, path, ttl, max_bytes):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, version INTEGER NOT NULL, body BLOB NOT NULL, size INTEGER NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_results_accessed_at ON results (accessed_at)')
+
+    @contextmanager
+    def _connect(self):
+        # A sqlite3 connection used as a context manager only commits or rolls back, so close it as well
+        with closing(sqlite3.connect(self.path, timeout=5)) as connection, connection:
+            yield connection
+
+    def get(self, key, version):
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT body FROM results WHERE key = ? AND version = ? AND expires_at >= ?', (key, version, now)
+            ).fetchone()
+            if row is not None:
+                connection.execute('UPDATE results SET accessed_at = ? WHERE key = ?', (now, key))
+
+        with self.lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, body, version):
+        if len(body) > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._connect() as connection:
+            # Entries of older data versions and expired entries can never be hit again
+            connection.execute('DELETE FROM results WHERE version != ? OR expires_at < ?', (version, now))
+            connection.execute(
+                'INSERT OR REPLACE INTO results (key, version, body, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, version, body, len(body), now + self.ttl, now)
+            )
+
+            # Evict least recently used entries until the cache fits
+            total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            if total > self.max_bytes:
+                evict = []
+                for old_key, size in connection.execute('SELECT key, size FROM results ORDER BY accessed_at'):
+                    if total <= self.max_bytes:
+                        break
+                    evict.append((old_key,))
+                    total -= size
+                connection.executemany('DELETE FROM results WHERE key = ?', evict)
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM results')
+
+    def stats(self):
+        with self._connect() as connection:
+            entries, size = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        with self.lock:
+            return {"backend": self.backend, "hits": self.hits, "misses": self.misses,
+                    "entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+
+def get_result_cache():
+    """
+    Get the result cache selected by Config.RESULT_CACHE_BACKEND ('memory', 'sqlite' or 'none').
+
+    :return: Cache instance of the current app, or None when caching is disabled.
+    """
+    if 'result_cache' not in current_app.extensions:
+        config = current_app.config
+        backend = config.get('RESULT_CACHE_BACKEND', 'memory')
+        ttl = config.get('RESULT_CACHE_TTL', 300)
+        max_bytes = config.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+
+        if backend == 'memory':
+            cache = MemoryResultCache(ttl, max_bytes)
+        elif backend == 'sqlite':
+            cache = SQLiteResultCache(config['RESULT_CACHE_PATH'], ttl, max_bytes)
+        elif backend in (None, '', 'none'):
+            cache = None
+        else:
+            raise ValueError(f"Invalid RESULT_CACHE_BACKEND '{backend}'. Use 'memory', 'sqlite' or 'none'.")
+        current_app.extensions['result_cache'] = cache
+
+    return current_app.extensions['result_cache']
+
+
+def result_cache_key(method, payload, version, response_format=JSON_MIMETYPE):
+    """
+    Build the cache key of an analyze request.
+
+    Company IDs keep their request order (only duplicates are dropped), because alternative weights,
+    comparisons and PROMETHEE alternative numbers follow it.
+
+    :param method: Analysis method (e.g. 'topsis').
+    :param payload: JSON request payload.
+    :param version: Data version of the indicators.
+    :param response_format: Negotiated MIME type of the response.
+    :return: Hex digest of the canonicalized request, or None when the payload is not a JSON object (not cached,
+        the route validates it).
+    """
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return None
+
+    payload = dict(payload)
+    if isinstance(payload.get('companies'), list):
+        payload['companies'] = list(dict.fromkeys(payload['companies']))
+
+    canonical = json.dumps([method, version, response_format, payload], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def cached_analysis(method):
+    """
+    Decorator caching successful responses of an analyze route, per negotiated response format.
+
+    :param method: Analysis method used in the cache key.
+    :return: Decorator.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_result_cache()
+            if cache is None:
+                return view(*args, **kwargs)
+
+            with Stage('cache'):
+                version = get_data_version()
+                response_format = negotiate_format()
+                key = result_cache_key(method, request.get_json(silent=True), version, response_format)
+                body = cache.get(key, version) if key is not None else None
+            if body is not None:
+                response = current_app.response_class(body, mimetype=response_format)
+                response.headers['X-Cache'] = 'HIT'
+                response.vary.add('Accept')
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if key is not None and response.status_code == 200 and response.mimetype == response_format \
+                    and not response.is_streamed:
+                with Stage('cache'):
+                    cache.set(key, response.get_data(), version)
+            response.headers['X-Cache'] = 'MISS'
+            response.vary.add('Accept')
+            return response
+
+        return wrapper
+
+    return decorator
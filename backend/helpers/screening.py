@@ -0,0 +1,100 @@
+import numpy as np
+
+from helpers.mcda_methods import topsis_scores, waspas_normalisation, wsm_scores, wpm_scores
+
+
+SCREEN_METHODS = ('topsis', 'wsm', 'wpm', 'waspas')
+
+# Page size when the request has no top_k
+DEFAULT_TOP_K = 10
+
+
+def parse_filters(filters, criteria):
+    """
+    Validate the filters of a screening request.
+
+    :param filters: Dictionary with optional rank_min, rank_max (Fortune rank, inclusive) and criteria, a dictionary
+                    of criterion ID to {"min": value, "max": value} bounds (inclusive).
+    :param criteria: List of criteria metadata from list_criteria().
+    :return: Tuple of (rank_min, rank_max) and a list of (criterion index, min, max) bounds; None for open ends.
+    :raises ValueError: For an unknown criterion or a non-numeric bound.
+    """
+    filters = filters or {}
+    if not isinstance(filters, dict):
+        raise ValueError('filters must be an object')
+
+    def bound(value, name):
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid {name} '{value}'")
+
+    rank_range = (bound(filters.get('rank_min'), 'rank_min'), bound(filters.get('rank_max'), 'rank_max'))
+
+    criterion_bounds = filters.get('criteria') or {}
+    if not isinstance(criterion_bounds, dict):
+        raise ValueError('filters.criteria must be an object of criterion ID to bounds')
+
+    criterion_index = {criterion["id"]: k for k, criterion in enumerate(criteria)}
+    bounds = []
+    for criterion_id, limits in criterion_bounds.items():
+        if criterion_id not in criterion_index:
+            raise ValueError(f"Unknown criterion '{criterion_id}'")
+        if not isinstance(limits, dict):
+            raise ValueError(f"Bounds of '{criterion_id}' must be an object with min and/or max")
+        bounds.append((criterion_index[criterion_id], bound(limits.get('min'), f'{criterion_id} min'),
+                       bound(limits.get('max'), f'{criterion_id} max')))
+    return rank_range, bounds
+
+
+def screen_mask(decision_matrix, ranks, rank_range=(None, None), bounds=()):
+    """
+    Select the companies with complete data that pass the filters, in one vectorized pass.
+
+    :param decision_matrix: Decision matrix of the whole universe (companies x criteria), NaN for missing data.
+    :param ranks: Fortune rank of each company, NaN when unknown (excluded by a rank filter).
+    :param rank_range: Inclusive (min, max) rank, None for an open end.
+    :param bounds: List of (criterion index, min, max) from parse_filters.
+    :return: Tuple of the boolean mask of selected companies and the mask of companies with complete data.
+    """
+    complete = np.all(np.isfinite(decision_matrix), axis=1)
+    mask = complete.copy()
+
+    rank_min, rank_max = rank_range
+    if rank_min is not None:
+        mask &= ranks >= rank_min
+    if rank_max is not None:
+        mask &= ranks <= rank_max
+
+    for k, low, high in bounds:
+        if low is not None:
+            mask &= decision_matrix[:, k] >= low
+        if high is not None:
+            mask &= decision_matrix[:, k] <= high
+    return mask, complete
+
+
+def screen_scores(decision_matrix, criterion_types, weights, method, lambda_value=0.5):
+    """
+    Score the screened companies with one method.
+
+    :param decision_matrix: Decision matrix of the selected companies (companies x criteria).
+    :param criterion_types: Type of each criterion (max for benefit, min for cost).
+    :param weights: Criteria weights.
+    :param method: 'topsis', 'wsm', 'wpm' or 'waspas'.
+    :param lambda_value: Weight of WSM in WASPAS.
+    :return: Score of each company (higher is better).
+    """
+    if method == 'topsis':
+        return topsis_scores(decision_matrix, weights, criterion_types)
+
+    normalized_matrix = waspas_normalisation(decision_matrix, criterion_types)
+    if method == 'wsm':
+        return wsm_scores(normalized_matrix, weights)
+    if method == 'wpm':
+        return wpm_scores(normalized_matrix, weights)
+    if method == 'waspas':
+        return lambda_value * wsm_scores(normalized_matrix, weights) + (1 - lambda_value) * wpm_scores(normalized_matrix, weights)
+    raise ValueError(f"Invalid method '{method}'. Use one of: {', '.join(SCREEN_METHODS)}.")
@@ -0,0 +1,192 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from helpers.mcda_methods import topsis_normalisation, topsis_closeness, waspas_normalisation, wsm_scores, wpm_scores
+
+
+SENSITIVITY_METHODS = ('topsis', 'waspas', 'wsm', 'wpm')
+SENSITIVITY_MODES = ('one_at_a_time', 'dirichlet')
+
+
+def prepare_scoring(method, decision_matrix, criterion_types, lambda_value=0.5):
+    """
+    Normalise the decision matrix once for all weight samples.
+
+    :param method: 'topsis', 'waspas', 'wsm' or 'wpm'.
+    :param decision_matrix: Decision matrix (companies x criteria).
+    :param criterion_types: Type of each criterion (max for benefit, min for cost).
+    :param lambda_value: WASPAS weight of WSM.
+    :return: Picklable scoring state for score_weights.
+    """
+    if method == 'topsis':
+        return method, topsis_normalisation(decision_matrix), list(criterion_types), lambda_value
+    if method in ('waspas', 'wsm', 'wpm'):
+        return method, waspas_normalisation(decision_matrix, criterion_types), list(criterion_types), lambda_value
+    raise ValueError(f"Invalid method. Use one of {', '.join(SENSITIVITY_METHODS)}.")
+
+
+def score_weights(scoring, weight_matrix):
+    """
+    Score companies for a chunk of weight vectors.
+
+    :param scoring: State from prepare_scoring.
+    :param weight_matrix: Weight vectors (samples x criteria).
+    :return: Scores (samples x companies).
+    """
+    method, normalized_matrix, criterion_types, lambda_value = scoring
+    if method == 'topsis':
+        return topsis_closeness(normalized_matrix, weight_matrix, criterion_types)
+    if method == 'wsm':
+        return wsm_scores(normalized_matrix, weight_matrix)
+    if method == 'wpm':
+        return wpm_scores(normalized_matrix, weight_matrix)
+    wsm = wsm_scores(normalized_matrix, weight_matrix)
+    wpm = wpm_scores(normalized_matrix, weight_matrix)
+    return lambda_value * wsm + (1 - lambda_value) * wpm
+
+
+def rank_positions(scores):
+    """
+    Rank position of every company for every sample.
+
+    :param scores: Scores (samples x companies), higher is better.
+    :return: Zero-based ranks (samples x companies); ties keep company order.
+    """
+    order = np.argsort(-scores, axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(scores.shape[1])[np.newaxis, :], axis=1)
+    return ranks
+
+
+def count_ranks(ranks):
+    """
+    Count how often each company lands on each rank.
+
+    :param ranks: Zero-based ranks (samples x companies).
+    :return: Counts (companies x ranks).
+    """
+    n = ranks.shape[1]
+    cells = np.arange(n)[np.newaxis, :] * n + ranks
+    return np.bincount(cells.ravel(), minlength=n * n).reshape(n, n)
+
+
+def rank_counts(scoring, weight_matrix):
+    """
+    Rank counts for a chunk of weight vectors (the unit of work of the process pool).
+
+    :param scoring: State from prepare_scoring.
+    :param weight_matrix: Weight vectors (samples x criteria).
+    :return: Counts (companies x ranks).
+    """
+    return count_ranks(rank_positions(score_weights(scoring, weight_matrix)))
+
+
+def one_at_a_time_weights(base_weights, steps):
+    """
+    Weight vectors sweeping one criterion at a time over [0, 1].
+
+    The swept weight takes every grid value; the other weights keep their proportions and sum to the rest.
+
+    :param base_weights: Base weights, normalised to sum to 1.
+    :param steps: Number of grid values per criterion.
+    :return: Tuple of grid (steps) and weight vectors (criteria x steps x criteria).
+    """
+    m = len(base_weights)
+    grid = np.linspace(0, 1, steps)
+    weights = np.empty((m, steps, m))
+    for k in range(m):
+        others = np.delete(base_weights, k)
+        others = others / others.sum() if others.sum() > 0 else np.full(m - 1, 1 / (m - 1))
+        weights[k] = np.insert(np.outer(1 - grid, others), k, grid, axis=1)
+    return grid, weights
+
+
+def rank_reversal_thresholds(grid, base_weight, ranks, base_ranks):
+    """
+    Nearest grid weights below and above the base weight at which each company's rank changes.
+
+    :param grid: Grid of values of the swept weight.
+    :param base_weight: Base value of the swept weight.
+    :param ranks: Ranks along the sweep (steps x companies).
+    :param base_ranks: Ranks at the base weights (companies).
+    :return: List of (below, above) per company; None where the rank never changes on that side.
+    """
+    changed = ranks != base_ranks[np.newaxis, :]
+    below = grid < base_weight
+    above = grid > base_weight
+
+    thresholds = []
+    for i in range(ranks.shape[1]):
+        lower = grid[below & changed[:, i]]
+        upper = grid[above & changed[:, i]]
+        thresholds.append((float(lower.max()) if lower.size else None, float(upper.min()) if upper.size else None))
+    return thresholds
+
+
+def sensitivity_analysis(decision_matrix, criterion_types, base_weights, method='topsis', mode='one_at_a_time',
+                         lambda_value=0.5, steps=21, samples=1000, concentration=1.0, seed=0, chunk_size=256,
+                         workers=1):
+    """
+    Weight-sensitivity analysis of a TOPSIS / WASPAS / WSM / WPM ranking.
+
+    The decision matrix is normalised once and weight vectors are scored in vectorized chunks.
+    'one_at_a_time' sweeps each weight over a grid and reports rank-reversal thresholds;
+    'dirichlet' samples weight vectors around the base weights (optionally over a process pool).
+    Both modes report how often each company lands on each rank.
+
+    :param decision_matrix: Decision matrix (companies x criteria).
+    :param criterion_types: Type of each criterion (max for benefit, min for cost).
+    :param base_weights: Base criteria weights.
+    :param method: 'topsis', 'waspas', 'wsm' or 'wpm'.
+    :param mode: 'one_at_a_time' or 'dirichlet'.
+    :param lambda_value: WASPAS weight of WSM.
+    :param steps: Grid values per criterion for 'one_at_a_time'.
+    :param samples: Number of weight vectors for 'dirichlet'.
+    :param concentration: Dirichlet concentration; alpha = concentration * criteria * base weights.
+    :param seed: Random seed for 'dirichlet' (fixed by default, so cached results are reproducible).
+    :param chunk_size: Weight vectors scored at once.
+    :param workers: Processes started for the 'dirichlet' chunks of this call (1 scores in-process).
+    :return: Dictionary with base_ranks, rank_counts (companies x ranks), samples and thresholds
+             (criteria x companies x (below, above), only for 'one_at_a_time').
+    """
+    if mode not in SENSITIVITY_MODES:
+        raise ValueError(f"Invalid mode. Use one of {', '.join(SENSITIVITY_MODES)}.")
+
+    base_weights = np.asarray(base_weights, dtype=float)
+    if base_weights.shape != (len(criterion_types),) or np.any(base_weights < 0) or base_weights.sum() <= 0:
+        raise ValueError("Weights must be non-negative, not all zero and have one value per criterion.")
+    base_weights = base_weights / base_weights.sum()
+
+    scoring = prepare_scoring(method, decision_matrix, criterion_types, lambda_value)
+    n = np.shape(decision_matrix)[0]
+    base_ranks = rank_positions(score_weights(scoring, base_weights[np.newaxis, :]))[0]
+
+    if mode == 'one_at_a_time':
+        grid, sweeps = one_at_a_time_weights(base_weights, steps)
+        flat = sweeps.reshape(-1, len(base_weights))
+        ranks = np.concatenate([
+            rank_positions(score_weights(scoring, flat[start:start + chunk_size]))
+            for start in range(0, len(flat), chunk_size)
+        ]).reshape(len(base_weights), steps, n)
+
+        thresholds = [rank_reversal_thresholds(grid, base_weights[k], ranks[k], base_ranks) for k in range(len(base_weights))]
+        counts = count_ranks(ranks.reshape(-1, n))
+        return {"base_ranks": base_ranks, "rank_counts": counts, "samples": len(flat), "thresholds": thresholds}
+
+    # Dirichlet samples are drawn up front, so results do not depend on the number of workers
+    rng = np.random.default_rng(seed)
+    alpha = np.maximum(concentration * len(base_weights) * base_weights, 1e-3)
+    weight_samples = rng.dirichlet(alpha, size=samples)
+    chunks = [weight_samples[start:start + chunk_size] for start in range(0, samples, chunk_size)]
+    counts = np.zeros((n, n), dtype=np.int64)
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_counts in executor.map(rank_counts, [scoring] * len(chunks), chunks):
+                counts += chunk_counts
+    else:
+        for chunk in chunks:
+            counts += rank_counts(scoring, chunk)
+
+    return {"base_ranks": base_ranks, "rank_counts": counts, "samples": samples, "thresholds": None}
@@ -0,0 +1,148 @@
+import glob
+import json
+import os
+import re
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import text
+
+from app import db
+from app.models import Company
+from helpers.data_version import get_data_version
+from helpers.mcda_helpers import list_criteria, query_company_indicators
+
+
+# File names of one exported version: the matrix and its sidecar index
+MATRIX_FILE = 'indicators-v{version}.npy'
+INDEX_FILE = 'indicators-v{version}.json'
+VERSION_PATTERN = re.compile(r'indicators-v(\d+)\.(npy|json)$')
+
+
+def shared_matrix_dir():
+    """
+    Get the directory of the shared decision-matrix files.
+
+    :return: Directory from Config.SHARED_MATRIX_DIR, or None when sharing is disabled.
+    """
+    return current_app.config.get('SHARED_MATRIX_DIR') or None
+
+
+def read_indicator_columns(criterion_ids):
+    """
+    Read the whole financial_indicators table in columnar form.
+
+    :param criterion_ids: Criterion IDs (FinancialIndicator columns) to read.
+    :return: Tuple of index (criteria, company_ids, names, symbols, ranks) and values (criteria x companies).
+    """
+    rows = query_company_indicators(None, criterion_ids)
+    ranks = dict(db.session.query(Company.id, Company.rank))
+    index = {
+        "criteria": list(criterion_ids),
+        "company_ids": [row[0] for row in rows],
+        "names": [row[1] for row in rows],
+        "symbols": [row[2] for row in rows],
+        "ranks": [ranks.get(row[0]) for row in rows]
+    }
+
+    # Missing (NULL) indicators become NaN; one contiguous row per criterion
+    values = np.array([row[3:] for row in rows], dtype=float).reshape(len(rows), len(criterion_ids))
+    return index, np.ascontiguousarray(values.T)
+
+
+def _replace_file(path, write):
+    # Write to a private temporary file and rename it over the target, so readers never see a partial file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def export_shared_matrix(directory=None):
+    """
+    Export the companies x criteria matrix and its name/symbol index for memory-mapping by the workers.
+
+    The data version and the indicators are read in one read transaction, so the export is labelled with the
+    version of the data it holds even if an ingestion commit lands meanwhile. The sidecar index is published first
+    and the matrix last, so an existing .npy file always has its index. Files of older versions are removed;
+    workers that still map them keep their pages until they reload.
+
+    :param directory: Target directory (defaults to Config.SHARED_MATRIX_DIR).
+    :return: Exported data version (None when sharing is disabled).
+    """
+    directory = directory or shared_matrix_dir()
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+
+    # pysqlite only opens a transaction before writes; open a read transaction for both reads
+    in_transaction = db.session.connection().connection.dbapi_connection.in_transaction
+    if not in_transaction:
+        db.session.execute(text('BEGIN'))
+    try:
+        version = get_data_version()
+        index, values = read_indicator_columns([criterion["id"] for criterion in list_criteria()])
+    finally:
+        if not in_transaction:
+            db.session.commit()
+    index["version"] = version
+
+    matrix_path = os.path.join(directory, MATRIX_FILE.format(version=version))
+    index_path = os.path.join(directory, INDEX_FILE.format(version=version))
+    _replace_file(index_path, lambda file: file.write(json.dumps(index).encode('utf-8')))
+    _replace_file(matrix_path, lambda file: np.save(file, values))
+
+    # Remove exports of older versions; a newer export by another process is kept
+    for path in glob.glob(os.path.join(directory, 'indicators-v*')):
+        match = VERSION_PATTERN.search(path)
+        if match and int(match.group(1)) < version:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    return version
+
+
+def load_shared_matrix(version, criterion_ids, directory=None):
+    """
+    Memory-map the exported matrix of a data version.
+
+    :param version: Data version to load.
+    :param criterion_ids: Expected criterion IDs (the export is ignored if they differ).
+    :param directory: Source directory (defaults to Config.SHARED_MATRIX_DIR).
+    :return: Tuple of index and read-only memory-mapped values (criteria x companies), or None if not exported.
+    """
+    directory = directory or shared_matrix_dir()
+    if not directory:
+        return None
+    matrix_path = os.path.join(directory, MATRIX_FILE.format(version=version))
+    index_path = os.path.join(directory, INDEX_FILE.format(version=version))
+
+    try:
+        values = np.load(matrix_path, mmap_mode='r')
+        with open(index_path, 'r', encoding='utf-8') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    # Exports without the ranks (older layout) are exported again
+    if "ranks" not in index or index.get("criteria") != list(criterion_ids) or values.shape != (len(criterion_ids), len(index["company_ids"])):
+        return None
+    return index, values
+
+
+# Run from the backend folder to (re)export the current data: python -m helpers.shared_matrix
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+
+    with app.app_context():
+        print(f"Exported data version {export_shared_matrix()}")
@@ -0,0 +1,23 @@
+import json
+
+from flask import current_app
+
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def ndjson_response(records):
+    """
+    Stream records as newline-delimited JSON, one record per line.
+
+    The records are serialised as the response is sent, so a generator keeps only the current record in memory
+    and the first line goes out before the rest is computed.
+
+    :param records: Iterable of JSON-serialisable dictionaries.
+    :return: Streamed Flask response.
+    """
+    def generate():
+        for record in records:
+            yield json.dumps(record, separators=(',', ':')) + '\n'
+
+    return current_app.response_class(generate(), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,21 @@
+import numpy as np
+
+from helpers.ranking import page_info, top_k_indices
+
+
+def test_top_k_indices_ranks_nan_scores_last():
+    scores = [0.4, np.nan, 0.9, 0.1, np.nan, 0.6]
+
+    assert top_k_indices(scores, top_k=2).tolist() == [2, 5]
+    assert top_k_indices(scores, top_k=2, offset=2).tolist() == [0, 3]
+    assert top_k_indices(scores, top_k=2, offset=4).tolist() == [1, 4]
+    assert page_info(len(scores), top_k=2, offset=4)["next_offset"] is None
+
+
+def test_top_k_indices_matches_a_stable_full_sort():
+    scores = np.array([0.5, 0.2, 0.5, np.nan, 0.8, 0.2, 0.1])
+    full = np.argsort(-np.where(np.isnan(scores), -np.inf, scores), kind='stable')
+
+    for top_k in range(1, len(scores) + 1):
+        for offset in range(len(scores)):
+            assert top_k_indices(scores, top_k, offset).tolist() == full[offset:offset + top_k].tolist()